@@ -3,9 +3,18 @@ import shlex
 from mock import Mock
 import pytest
 
+from workspace.config import config
 from workspace.controller import Commander
 
 
+@pytest.fixture(autouse=True)
+def reference_cache_dir(monkeypatch, tmp_path):
+    """ Keeps reference mirrors of checkouts out of the user's cache dir """
+    cache_dir = tmp_path / 'reference-cache'
+    monkeypatch.setattr(config.checkout, 'reference_cache_dir', str(cache_dir))
+    return cache_dir
+
+
 @pytest.fixture()
 def wst(monkeypatch):
     def _run(cmd):
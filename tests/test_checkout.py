@@ -1,6 +1,15 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
 import os
+import time
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
 
+import pytest
 from test_stubs import temp_dir
+from utils.process import run
+from workspace.config import config
+from workspace.scm import evict_reference_repos, ProductUrlResolver, refresh_reference_repo, SCMError
 
 
 def test_checkout_with_http_git(wst):
@@ -20,3 +29,160 @@ def test_checkout_with_multiple_repos(wst):
         wst('checkout https://github.com/confluentinc/localconfig.git https://github.com/confluentinc/remoteconfig.git')
         assert os.path.exists('localconfig/README.rst')
         assert os.path.exists('remoteconfig/README.rst')
+
+
+def create_remote_repo(name):
+    """ Create a bare repo with 2 commits to checkout from """
+    run('git init -q {0}-src; cd {0}-src; git commit -q --allow-empty -m "First"; '
+        'git commit -q --allow-empty -m "Second"; git clone -q --bare . ../{0}.git'.format(name), shell=True)
+
+
+def test_checkout_multiple_repos_in_parallel(wst, capsys):
+    with temp_dir() as tmpdir:
+        for name in ['foo', 'bar']:
+            create_remote_repo(name)
+
+        os.mkdir('workspace')
+        os.chdir('workspace')
+        urls = ['file://{}/{}.git'.format(tmpdir, name) for name in ['foo', 'bar', 'missing']]
+
+        with pytest.raises(SystemExit):
+            wst('checkout --depth 1 ' + ' '.join(urls))
+
+        assert sorted(os.listdir()) == ['bar', 'foo']
+        assert run('git rev-list --count HEAD', cwd='foo', return_output=True).strip() == '1'
+
+        output = capsys.readouterr().out
+        assert 'Checked out bar' in output
+        assert 'Checked out foo' in output
+        assert 'Failed to checkout 1 of 3 products:\n  - missing: Failed to clone' in output
+
+        wst('checkout ' + ' '.join(urls[:2]))
+
+        output = capsys.readouterr().out
+        assert 'Updated bar' in output
+        assert 'Updated foo' in output
+
+
+def test_checkout_with_reference_cache(wst, monkeypatch, reference_cache_dir):
+    with temp_dir() as tmpdir:
+        cache_dir = reference_cache_dir
+        for name in ['foo', 'bar']:
+            create_remote_repo(name)
+
+        os.mkdir('workspace')
+        os.chdir('workspace')
+
+        wst('checkout file://{}/foo.git'.format(tmpdir))
+        mirrors = os.listdir(str(cache_dir))
+        assert len(mirrors) == 1 and mirrors[0].startswith('foo-')
+        assert not os.path.exists('foo/.git/objects/info/alternates')  # Does not depend on the mirror
+
+        # Added from the clone, but refreshed from the product URL with only branches and tags
+        mirror = str(cache_dir / mirrors[0])
+        assert run('git remote get-url origin', cwd=mirror, return_output=True).strip() == 'file://{}/foo.git'.format(tmpdir)
+        assert run('git for-each-ref --format=%(refname)', cwd=mirror, return_output=True).split() == ['refs/heads/master']
+
+        # Re-checkout uses the mirror and fetches what is new, then refreshes the mirror
+        refreshes = []
+        monkeypatch.setattr('workspace.scm.refresh_reference_repo',
+                            lambda path: refreshes.append(refresh_reference_repo(path)))
+        run('cd ../foo-src; git commit -q --allow-empty -m "Third"; git push -q ../foo.git master', shell=True)
+        run('rm -rf foo', shell=True)
+        wst('checkout file://{}/foo.git'.format(tmpdir))
+        assert run('git log -1 --format=%s', cwd='foo', return_output=True).strip() == 'Third'
+        assert len(refreshes) == 1 and refreshes[0].wait() == 0
+        assert run('git log -1 --format=%s', cwd=mirror, return_output=True).strip() == 'Third'
+
+        # Mirrors are evicted after the checkouts, except those used by them
+        os.utime(str(cache_dir / mirrors[0]), (0, 0))
+        monkeypatch.setattr(config.checkout, 'reference_cache_size_mb', 0)
+        wst('checkout file://{}/bar.git'.format(tmpdir))
+        bar_mirrors = [m for m in os.listdir(str(cache_dir)) if m.startswith('bar-')]
+        assert os.listdir(str(cache_dir)) == bar_mirrors
+
+        assert evict_reference_repos() == [str(cache_dir / bar_mirrors[0])]
+        assert os.listdir(str(cache_dir)) == []
+
+
+@pytest.fixture()
+def search_api(monkeypatch):
+    """ Local stub of the repo search API that returns repos from `repos` and records queries in `queries` """
+    class SearchHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)['q'][0]
+            server.queries.append(query)
+            names = [name.lower() for name in query.split(' OR ')]
+            items = [{'name': name, 'ssh_url': url} for name, url in sorted(server.repos.items()) if name in names]
+
+            self.send_response(200)
+            for header, value in server.headers.items():
+                self.send_header(header, value)
+            self.end_headers()
+            self.wfile.write(json.dumps({'items': items}).encode('utf-8'))
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), SearchHandler)
+    server.repos = {}
+    server.queries = []
+    server.headers = {}
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(config.checkout, 'search_api_url', 'http://127.0.0.1:{}/search'.format(server.server_port))
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_checkout_product_names(wst, monkeypatch, search_api):
+    with temp_dir() as tmpdir:
+        monkeypatch.setattr('workspace.scm.SEARCH_CACHE_FILE', str(tmpdir / 'search.json'))
+        monkeypatch.setattr(config.checkout, 'reference_cache_dir', '')
+        for name in ['foo', 'bar']:
+            create_remote_repo(name)
+            search_api.repos[name] = 'file://{}/{}.git'.format(tmpdir, name)
+
+        os.mkdir('workspace')
+        os.chdir('workspace')
+
+        wst('checkout foo bar')
+        assert sorted(os.listdir()) == ['bar', 'foo']
+        assert search_api.queries == ['bar OR foo']
+
+        # Resolved from cache
+        run('rm -rf foo bar', shell=True)
+        resolver = ProductUrlResolver(str(tmpdir / 'search.json'))
+        assert resolver.resolve_all(['foo', 'bar']) == {'foo': search_api.repos['foo'], 'bar': search_api.repos['bar']}
+        assert len(search_api.queries) == 1
+
+        with pytest.raises(SystemExit):
+            wst('checkout foo bar baz')
+        assert sorted(os.listdir()) == ['bar', 'foo']
+        assert search_api.queries[1:] == ['baz']
+
+
+def test_product_url_resolver_rate_limit(search_api, monkeypatch):
+    with temp_dir() as tmpdir:
+        resolver = ProductUrlResolver(str(tmpdir / 'search.json'))
+        search_api.repos['foo'] = 'git@github.com:maxzheng/foo.git'
+        search_api.headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '9999999999'}
+
+        assert resolver.resolve('foo') == 'git@github.com:maxzheng/foo.git'
+
+        with pytest.raises(SCMError) as e:
+            resolver.resolve('bar')
+        assert 'rate limit' in str(e.value)
+        assert search_api.queries == ['foo']
+
+        sleeps = []
+        monkeypatch.setattr('workspace.scm.time.sleep', sleeps.append)
+        resolver.rate_limit_reset = time.time() + 10
+        search_api.headers = {}
+        search_api.repos['bar'] = 'git@github.com:maxzheng/bar.git'
+
+        assert resolver.resolve('bar') == 'git@github.com:maxzheng/bar.git'
+        assert len(sleeps) == 1 and 0 < sleeps[0] <= 10
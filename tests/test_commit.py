@@ -1,3 +1,6 @@
+from utils.process import run
+
+from test_stubs import temp_git_repo
 from workspace.commands.commit import Commit
 
 
@@ -19,3 +22,26 @@ def test_branch_for_msg():
     assert 'fix-test' == Commit()._branch_for_msg('Fix test', 3)
     assert 'fix-test' == Commit()._branch_for_msg('Fix test to', 3)
     assert 'fix-test-to-work' == Commit()._branch_for_msg('Fix test to work', 3)
+
+
+def test_discard_and_move(wst):
+    def log():
+        return run('git log --format=%s', return_output=True).split()
+
+    with temp_git_repo():
+        for msg in ('first', 'second', 'third'):
+            run(['git', 'commit', '--allow-empty', '-m', msg])
+
+        wst('commit --discard')
+        assert log() == ['second', 'first']
+
+        wst('commit --move fix@master')
+        assert log() == ['first']
+
+        run('git checkout -q fix@master')
+        assert log() == ['second', 'first']
+
+        # Discarding all commits in a child branch removes it
+        wst('commit --discard')
+        assert run('git branch', return_output=True).split() == ['*', 'master']
+        assert log() == ['first']
@@ -0,0 +1,32 @@
+import os
+
+from utils.process import run
+from test_stubs import temp_dir
+
+
+def test_diff_multiple_repos(wst, capfd, monkeypatch):
+    monkeypatch.setenv('PAGER', 'cat')
+
+    with temp_dir():
+        for name in ['repo-b', 'repo-a', 'repo-c']:
+            os.makedirs(name)
+            run('git init', cwd=name)
+            with open(os.path.join(name, 'file'), 'w') as fp:
+                fp.write('old\n')
+            run('git add file', cwd=name)
+            run('git commit -m Dummy', cwd=name)
+
+        for name in ['repo-c', 'repo-b']:
+            with open(os.path.join(name, 'file'), 'w') as fp:
+                fp.write('new\n')
+        capfd.readouterr()
+
+        wst('diff --workers 2')
+        out, _ = capfd.readouterr()
+        assert 'repo-a' not in out
+        assert out.index('[ repo-b ]') < out.index('[ repo-c ]')
+        assert '+new' in out
+
+        wst('diff --name-only')
+        out, _ = capfd.readouterr()
+        assert out == '[ repo-b ]\nfile\n\n[ repo-c ]\nfile\n\n'
@@ -0,0 +1,47 @@
+import json
+import os
+import sys
+
+from utils.process import run
+
+from test_stubs import temp_dir
+from workspace.config import config
+from workspace.envpool import add_env, clone_env, closest_env, evict_envs
+
+
+def test_env_pool(monkeypatch):
+    with temp_dir() as cwd:
+        monkeypatch.setattr(config.test, 'env_pool_dir', str(cwd / 'pool'))
+        monkeypatch.setattr(config.test, 'env_pool_size', 1)
+
+        envdir = str(cwd / 'foo')
+        run([sys.executable, '-m', 'venv', envdir])
+        python_version = run([sys.executable, '-c', 'import platform; print(platform.python_version())'],
+                             return_output=True).strip()
+
+        pooled_env = add_env(envdir)
+        assert pooled_env
+        assert add_env(envdir) == pooled_env
+
+        with open(os.path.join(pooled_env, 'pool.json')) as fp:
+            assert 'pip' in json.load(fp)['packages']
+
+        assert closest_env(python_version, {'pip', 'requests'}) == pooled_env
+        assert closest_env(python_version, {'requests'}) is None
+        assert closest_env('1.0.0', {'pip'}) is None
+
+        # Cloned env shares the files, and its scripts use its own python
+        clone_dir = str(cwd / 'bar')
+        assert clone_env(pooled_env, clone_dir, sys.executable)
+
+        pip_version = run([os.path.join(clone_dir, 'bin', 'pip'), '--version'], return_output=True)
+        assert os.path.join(clone_dir, 'lib') in pip_version
+
+        pip_init = [os.path.join(root, '__init__.py') for root, _, files in os.walk(pooled_env)
+                    if root.endswith(os.path.join('site-packages', 'pip'))][0]
+        assert os.stat(pip_init).st_nlink >= 3
+
+        # Least recently used envs are removed when the pool is full
+        os.mkdir(str(cwd / 'pool' / 'other'))
+        os.utime(pooled_env, (0, 0))
+        assert evict_envs() == [pooled_env]
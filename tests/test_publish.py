@@ -4,6 +4,8 @@ import pytest
 
 from utils.process import run
 
+from workspace.commands.publish import Publish
+from workspace.config import config
 from workspace.scm import commit_logs
 
 from test_stubs import temp_git_repo
@@ -136,3 +138,14 @@ Version 0.0.1
 
         setup_py = open('setup.py').read().split('\n')
         assert setup_py[5] == "    version='1.0.3',"
+
+
+def test_changes_since_last_publish(monkeypatch):
+    with temp_git_repo():
+        for msg in ['change1', 'Publish version 0.0.1', 'change2', 'change3', 'change4']:
+            run(['git', 'commit', '--allow-empty', '-m', msg])
+
+        assert Publish().changes_since_last_publish() == ('0.0.1', ['change4', 'change3', 'change2'])
+
+        monkeypatch.setattr(config.publish, 'max_changes', 2)
+        assert Publish().changes_since_last_publish() == (None, ['change4', 'change3'])
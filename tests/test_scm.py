@@ -0,0 +1,234 @@
+from functools import partial
+import os
+import shutil
+
+import pytest
+
+from utils.process import run
+
+from test_stubs import temp_dir, temp_git_repo
+from workspace import scm
+from workspace.scm import (all_branches, all_remotes, async_diff_repo, checkout_branch, commit_logs, commits,
+                           current_branch, git_query, git_query_stats, invalidate_repo_state, is_dirty, is_read_only_git,
+                           remote_tracking_branch, repo_state, repos, SCMError, is_up_to_date, remote_host, update_repo,
+                           UpdateError, workspace_index, WorkspaceIndex)
+from workspace.utils import ordered_async_call
+
+
+def test_repo_state():
+    with temp_git_repo() as repo:
+        assert repo_state().branches == []
+        assert current_branch() is None
+
+        run('git commit --allow-empty -m Dummy')
+        run('git remote add upstream https://github.com/maxzheng/remoteconfig.git')
+        run('git update-ref refs/remotes/upstream/master HEAD')
+        run('git branch feature@master')
+
+        # Cached until invalidated
+        assert repo_state() is repo_state(str(repo))
+        assert current_branch() is None
+
+        invalidate_repo_state()
+        assert current_branch() == 'master'
+        assert all_remotes() == ['upstream']
+        assert remote_tracking_branch() is None
+        assert all_branches(remotes=True) == ['master', 'feature@master', 'remotes/upstream/master']
+
+        checkout_branch('upstream/master')
+        assert remote_tracking_branch() == 'upstream/master'
+        assert all_branches(verbose=True) == ['master', 'feature@master']
+
+        run('git checkout -q HEAD^0')
+        invalidate_repo_state()
+        assert all_branches()[0].startswith('(HEAD detached at ')
+        assert all_branches(verbose=True)[0].endswith('*')
+
+
+def test_git_query():
+    with temp_git_repo():
+        run('git commit --allow-empty -m First')
+        invalidate_repo_state(all=True)
+
+        assert git_query('git log --format=%s') == ('First\n', True)
+        assert git_query('git log --format=%s') == ('First\n', True)
+        assert git_query_stats == {'hits': 1, 'misses': 1}
+
+        # Mutating git commands invalidate queries for the repo
+        scm.silent_run('git commit --allow-empty -m Second')
+        assert git_query('git log --format=%s') == ('Second\nFirst\n', True)
+        assert git_query_stats == {'hits': 1, 'misses': 2}
+
+        # Read-only ones do not
+        scm.silent_run('git log -1')
+        git_query('git log --format=%s')
+        assert git_query_stats == {'hits': 2, 'misses': 2}
+
+        # Other commands may change files that git status reports on
+        assert git_query('git status --porcelain') == ('', True)
+        scm.silent_run('touch new-file')
+        assert git_query('git status --porcelain') == ('?? new-file\n', True)
+
+        assert commit_logs(limit=1, extra_args=['--format=%s']) == 'Second\n'
+        with pytest.raises(SCMError):
+            commit_logs(extra_args=['unknown-revision'])
+
+    assert is_read_only_git(['git', '-C', 'repo', 'rev-parse', 'HEAD'])
+    assert is_read_only_git('git remote -v')
+    assert is_read_only_git('git config --get user.name')
+    assert not is_read_only_git('git remote add origin url')
+    assert not is_read_only_git('git config user.name dev')
+    assert not is_read_only_git('git -c color.ui=false fetch')
+    assert not is_read_only_git('ls')
+
+
+def test_commits():
+    with temp_git_repo():
+        run('git commit --allow-empty -m First')
+        run(['git', 'commit', '--allow-empty', '-m', 'Second\n\nWith a body\n\nthat spans paragraphs'])
+        first, second = run('git rev-list HEAD', return_output=True).split()[::-1]
+
+        log = commits('HEAD')
+        assert [c.sha for c in log] == [second, first]
+        assert log[0].parents == [first]
+        assert log[0].subject == 'Second'
+        assert log[0].body == 'With a body\n\nthat spans paragraphs'
+        assert str(log[1]) == first[:7] + ' First'
+
+        assert commits('HEAD..HEAD') == []
+
+        with pytest.raises(SCMError):
+            commits('HEAD..unknown')
+
+        assert not is_dirty()
+        run('touch new-file')
+        assert is_dirty()
+
+
+def test_async_diff_repo():
+    with temp_git_repo():
+        run('git commit --allow-empty -m Dummy')
+        run('touch file')
+        run('git add file')
+
+        async def diff(repo):
+            return await async_diff_repo(repo, branch='HEAD', name_only=True)
+
+        assert list(ordered_async_call(diff, ['.'])) == [('.', 'file\n')]
+
+        with pytest.raises(SCMError):
+            list(ordered_async_call(partial(async_diff_repo, branch='unknown'), ['.']))
+
+
+def test_update_repo_from_multiple_remotes():
+    with temp_dir():
+        run('git init --bare remote.git')
+        run('git clone remote.git repo')
+        run('git commit --allow-empty -m Dummy', cwd='repo')
+        run('git push origin master', cwd='repo')
+        run('git clone remote.git fork')
+        run('git commit --allow-empty -m New', cwd='fork')
+        run('git remote add upstream ../fork', cwd='repo')
+        run('git remote add broken ../missing.git', cwd='repo')
+
+        with pytest.raises(SCMError) as e:
+            update_repo('repo', quiet=True)
+
+        assert str(e.value) == 'Failed to pull from remote(s): broken'
+        assert 'New' in run('git log --oneline', cwd='repo', return_output=True)
+
+
+def test_update_repo_without_remote_tracking_ref():
+    with temp_dir():
+        run('git init --bare remote.git')
+        run('git clone remote.git repo')
+        run('git commit --allow-empty -m Dummy', cwd='repo')
+        run('git push origin master', cwd='repo')
+        run('git clone remote.git fork')
+        run('git commit --allow-empty -m New', cwd='fork')
+        run('git branch other', cwd='fork')
+
+        # Only fetches another branch, so there is no upstream/master to merge from after the fetch.
+        run('git remote add upstream ../fork', cwd='repo')
+        run('git config remote.upstream.fetch +refs/heads/other:refs/remotes/upstream/other', cwd='repo')
+
+        update_repo('repo', quiet=True)
+        assert 'New' in run('git log --oneline', cwd='repo', return_output=True)
+
+
+def test_pull_error():
+    output = ('remote: Enumerating objects: 5, done.\nremote: Counting objects:  50% (1/2)\r'
+              'remote: Counting objects: 100% (2/2), done.\nReceiving objects: 100% (3/3), done.\n'
+              'Not possible to fast-forward, aborting.\n')
+    assert scm._pull_error(output) == 'Not possible to fast-forward, aborting'
+    assert scm._pull_error('Receiving objects: 100% (3/3)\nfatal: repository not found\n') == 'repository not found'
+
+
+def test_remote_host():
+    assert remote_host('git@github.com:maxzheng/workspace-tools.git') == 'github.com'
+    assert remote_host('https://GitHub.com/maxzheng/workspace-tools.git') == 'github.com'
+    assert remote_host('ssh://git@git.example.com:2222/workspace-tools.git') == 'git.example.com'
+    assert remote_host('file:///tmp/workspace-tools.git') == 'localhost'
+    assert remote_host('../workspace-tools.git') == 'localhost'
+
+
+def test_update_error_is_transient():
+    assert UpdateError('', {'origin': 'Connection reset by peer'}).is_transient()
+    assert UpdateError('', {'origin': 'unable to access: The requested URL returned error: 503'}).is_transient()
+    assert not UpdateError('', {'origin': 'Connection reset by peer', 'upstream': 'Not possible to fast-forward'}
+                           ).is_transient()
+
+
+def test_is_up_to_date():
+    with temp_dir():
+        run('git init --bare remote.git')
+        run('git clone remote.git repo')
+        run('git commit --allow-empty -m Dummy', cwd='repo')
+        run('git push origin master', cwd='repo')
+        assert is_up_to_date('repo')
+
+        run('git commit --allow-empty -m Local', cwd='repo')
+        assert is_up_to_date('repo')
+
+        run('git tag 1.0', cwd='repo')
+        run('git push origin 1.0', cwd='repo')
+        run('git tag -d 1.0', cwd='repo')
+        assert not is_up_to_date('repo')
+
+        update_repo('repo', quiet=True)
+        assert is_up_to_date('repo')
+
+        run('git clone remote.git other')
+        run('git commit --allow-empty -m New', cwd='other')
+        run('git push origin master', cwd='other')
+        assert not is_up_to_date('repo')
+
+
+def test_workspace_index():
+    with temp_dir() as workspace:
+        assert repos() == []
+        assert not os.path.exists(WorkspaceIndex.FILE_NAME)
+
+        run('git init repo-b')
+        run('git init repo-a')
+        os.makedirs('not-repo')
+
+        assert repos() == [str(workspace / 'repo-a'), str(workspace / 'repo-b')]
+        assert os.path.exists(WorkspaceIndex.FILE_NAME)
+
+        assert workspace_index().is_valid()
+
+        # Loaded from file
+        index = WorkspaceIndex(str(workspace))
+        assert index.is_valid()
+        assert index.repos == [str(workspace / 'repo-a'), str(workspace / 'repo-b')]
+
+        shutil.rmtree('repo-b')
+        assert repos() == [str(workspace / 'repo-a')]
+
+        # Sub-dir changes do not change the workspace dir's mtime
+        run('git init not-repo')
+        assert repos() == [str(workspace / 'not-repo'), str(workspace / 'repo-a')]
+
+        shutil.rmtree(str(workspace / 'repo-a' / '.git'))
+        assert repos() == [str(workspace / 'not-repo')]
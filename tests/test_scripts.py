@@ -1,5 +1,6 @@
 import pytest
 import subprocess
+import sys
 
 from utils.process import run
 
@@ -12,3 +13,28 @@ def test_script_sanity(script):
     except subprocess.CalledProcessError as e:
         print(e.output)
         assert e.returncode == 0
+
+
+def test_lazy_command_loading():
+    script = ("import sys; sys.argv = ['wst', 'st', '-h']\n"
+              "from workspace.controller import Commander\n"
+              "try:\n"
+              "    Commander.main()\n"
+              "except SystemExit:\n"
+              "    print(' '.join(sorted(m for m in sys.modules if m.startswith('workspace.commands.') or m == 'git')))")
+    output = run([sys.executable, '-c', script], return_output=True)
+
+    assert output.strip().split('\n')[-1] == 'workspace.commands.helpers workspace.commands.status'
+
+
+def test_controller_imports():
+    script = "import sys, workspace.controller; print(sorted(m for m in ('requests', 'workspace.scm') if m in sys.modules))"
+    output = run([sys.executable, '-c', script], return_output=True)
+
+    assert output.strip().split('\n')[-1] == '[]'
+
+
+def test_command_aliases():
+    from workspace.controller import Commander
+
+    assert Commander.aliases() == {'co': 'checkout', 'ci': 'commit', 'di': 'diff', 'st': 'status', 'up': 'update'}
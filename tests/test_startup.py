@@ -0,0 +1,132 @@
+"""
+Startup time benchmark for each command to catch import regressions, such as from new dependencies.
+
+It measures how much CPU time it takes for ``wst <command>`` to reach the command's run() in a fresh interpreter, both
+cold (no bytecode cache) and warm, and fails if it exceeds the budget. CPU time is used as it is not affected much by
+other processes, such as tests running in parallel. Budgets can be changed with env vars:
+
+  * WST_STARTUP_BUDGET_MS: Max warm startup time in milliseconds for any command.
+  * WST_COLD_STARTUP_BUDGET_MS: Max cold startup time in milliseconds for any command.
+
+Run with -s to see the startup times and the slowest imports per command, in the style of "python -X importtime".
+"""
+import os
+import shutil
+import sys
+from tempfile import mkdtemp
+
+import pytest
+from utils.process import run
+
+import workspace
+from test_stubs import temp_git_repo
+from workspace.controller import Commander
+
+STARTUP_BUDGET_MS = float(os.environ.get('WST_STARTUP_BUDGET_MS', 1000))
+COLD_STARTUP_BUDGET_MS = float(os.environ.get('WST_COLD_STARTUP_BUDGET_MS', 5000))
+WARM_RUNS = 3
+SLOWEST_IMPORTS = 10
+
+#: Args required by commands to reach their run()
+COMMAND_ARGS = {
+    'checkout': ['workspace-tools']
+}
+
+# Stops right before the command runs, and prints how much CPU time it took to get there.
+STARTUP_SCRIPT = """
+import sys
+import time
+
+start = time.process_time()
+sys.argv = %r
+
+from workspace.controller import Commander
+
+
+def run(self, name=None, **kwargs):
+    if not name:
+        return self._run()
+    self.command(name)
+    print('%%.3f' %% ((time.process_time() - start) * 1000))
+    sys.exit(0)
+
+
+Commander.run = run
+Commander.main()
+"""
+
+
+def measure_startup(command, pycache_dir, import_time=False):
+    """
+    Run the command in a new interpreter until it reaches run()
+
+    :param str command: Command to run
+    :param str pycache_dir: Directory to use for bytecode cache. Use an empty one for cold startup.
+    :param bool import_time: Collect import times. This slows down startup, so the startup time is not accurate.
+    :return: Tuple of (startup CPU time in ms, list of (module, self ms, cumulative ms, depth) imports)
+    """
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_dir,
+               PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.dirname(workspace.__file__)),
+                                           os.environ.get('PYTHONPATH', '')]))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    script = STARTUP_SCRIPT % (['wst', command] + COMMAND_ARGS.get(command, []))
+    cmd = [sys.executable, '-X', 'importtime', '-c', script] if import_time else [sys.executable, '-c', script]
+    output, success = run(cmd, env=env, return_output=2)
+
+    assert success, output
+
+    startup_ms = None
+    imports = []
+
+    for line in output.split('\n'):
+        if line.startswith('import time:'):
+            self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+            if self_us.strip().isdigit():
+                depth = (len(name) - len(name.lstrip()) - 1) // 2
+                imports.append((name.strip(), int(self_us) / 1000.0, int(cumulative_us) / 1000.0, depth))
+        elif line.strip():
+            try:
+                startup_ms = float(line)
+            except ValueError:
+                pass
+
+    return startup_ms, imports
+
+
+def slowest_imports(imports, limit=SLOWEST_IMPORTS):
+    """ Format the slowest imports by cumulative time """
+    lines = ['  %10s | %10s | %s' % ('self [ms]', 'cumulative', 'imported package')]
+    by_cumulative = sorted(imports, key=lambda i: i[2], reverse=True)
+
+    for name, self_ms, cumulative_ms, depth in by_cumulative[:limit]:
+        lines.append('  %10.1f | %10.1f | %s%s' % (self_ms, cumulative_ms, '  ' * depth, name))
+
+    return '\n'.join(lines)
+
+
+@pytest.fixture(scope='module')
+def pycache_dir():
+    dir = mkdtemp()
+    yield dir
+    shutil.rmtree(dir)
+
+
+@pytest.mark.parametrize('command', sorted(Commander.commands()))
+def test_startup_time(command, pycache_dir):
+    with temp_git_repo():
+        cold_pycache_dir = mkdtemp()
+        try:
+            cold_ms, _ = measure_startup(command, cold_pycache_dir)
+        finally:
+            shutil.rmtree(cold_pycache_dir)
+
+        _, imports = measure_startup(command, pycache_dir, import_time=True)  # Also primes the cache
+        warm_ms = min(measure_startup(command, pycache_dir)[0] for _ in range(WARM_RUNS))
+
+    report = slowest_imports(imports)
+    print('\n{}: {:.1f}ms cold, {:.1f}ms warm\n{}'.format(command, cold_ms, warm_ms, report))
+
+    assert cold_ms <= COLD_STARTUP_BUDGET_MS, 'Cold startup for "{}" took {:.1f}ms (budget is {:.0f}ms)\n{}'.format(
+        command, cold_ms, COLD_STARTUP_BUDGET_MS, report)
+    assert warm_ms <= STARTUP_BUDGET_MS, 'Warm startup for "{}" took {:.1f}ms (budget is {:.0f}ms)\n{}'.format(
+        command, warm_ms, STARTUP_BUDGET_MS, report)
@@ -1,7 +1,8 @@
+import os
 import re
 
 from utils.process import run
-from test_stubs import temp_git_repo
+from test_stubs import temp_dir, temp_git_repo
 
 
 def test_status(wst, capsys):
@@ -24,3 +25,23 @@ def test_status(wst, capsys):
         wst('status')
         out, _ = capsys.readouterr()
         assert re.fullmatch('# Branches: \w+\* feature master\n', out)
+
+
+def test_status_multiple_repos(wst, capfd, monkeypatch):
+    monkeypatch.setenv('PAGER', 'cat')
+
+    with temp_dir():
+        for name in ['repo-b', 'repo-a', 'repo-c']:
+            os.makedirs(name)
+            run('git init', cwd=name)
+            run('git commit --allow-empty -m Dummy', cwd=name)
+        run('git checkout -b feature@master', cwd='repo-c')
+        run('touch new-file', cwd='repo-b', shell=True)
+        capfd.readouterr()
+
+        wst('status')
+        out, _ = capfd.readouterr()
+        assert out.startswith('[ repo-b ]\n')
+        assert 'new-file' in out
+        assert out.index('new-file') < out.index('[ repo-c ]\n# Branches: feature@master')
+        assert 'repo-a' not in out
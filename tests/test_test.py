@@ -0,0 +1,278 @@
+import json
+import os
+import platform
+import sys
+import time
+
+import pytest
+from utils.process import run
+
+from test_stubs import temp_dir, temp_git_repo
+from workspace.commands.helpers import ToxIni
+from workspace.commands.test import (dependency_graph, DEPENDENCY_GRAPH_FILE, env_dependencies, requirements_changed,
+                                     requirements_diff, requirements_inputs, schedule, write_requirements_fingerprint)
+from workspace.config import config
+from workspace.envpool import add_env
+
+TOX_INI = """\
+[tox]
+envlist = py, style
+
+[testenv]
+basepython = {python}
+deps =
+    pytest  # For tests
+    mock
+envdir = {{toxinidir}}/venv
+
+[testenv:style]
+deps = flake8
+install_command = pip install -U {{packages}}
+"""
+
+
+def test_requirements_changed():
+    with temp_dir() as cwd:
+        with open('tox.ini', 'w') as fp:
+            fp.write(TOX_INI.format(python=sys.executable))
+        with open('requirements.txt', 'w') as fp:
+            fp.write('requests>=2\n')
+        os.mkdir('venv')
+
+        tox = ToxIni(str(cwd))
+
+        # Envs without a fingerprint fall back to mtime, and get one if they are up to date
+        os.utime('venv', (0, 0))
+        assert requirements_changed(tox, 'py')
+
+        os.utime('venv', None)
+        assert not requirements_changed(tox, 'py')
+        assert not requirements_changed(tox, 'py')
+
+        write_requirements_fingerprint(tox, 'style')
+        assert not requirements_changed(tox, 'style')
+
+        # Touching files or changing whitespace / comments does not change the fingerprint
+        os.utime('venv', (0, 0))
+        with open('requirements.txt', 'w') as fp:
+            fp.write('# HTTP\n  requests>=2   \n\n')
+        assert not requirements_changed(tox, 'py')
+
+        with open('requirements.txt', 'a') as fp:
+            fp.write('click\n')
+        assert requirements_changed(tox, 'py')
+        assert requirements_changed(tox, 'style')
+
+        write_requirements_fingerprint(tox, 'py')
+        assert not requirements_changed(tox, 'py')
+
+        with open('tox.ini', 'w') as fp:
+            fp.write(TOX_INI.format(python=sys.executable).replace('mock', 'pytest-mock'))
+        assert requirements_changed(ToxIni(str(cwd)), 'py')
+
+        # Envs without basepython use the Python that tox runs with
+        with open('tox.ini', 'w') as fp:
+            fp.write(TOX_INI.format(python='').replace('basepython = \n', ''))
+        tox = ToxIni(str(cwd))
+        assert tox.basepython('style') == sys.executable
+        assert requirements_inputs(tox, 'style')['python'] == platform.python_version()
+
+
+def test_requirements_diff():
+    old = {'requirements.txt': ['requests>=2', 'click'], 'pinned.txt': ['click==7.0', 'six==1.0'],
+           'deps': ['pytest', '-rrequirements.txt'], 'python': '3.7.9'}
+
+    assert requirements_diff(old, dict(old)) == ({}, set())
+    assert requirements_diff(old, dict(old, python='3.8.0')) is None
+    assert requirements_diff(old, dict(old, deps=['pytest', '-rother.txt'])) is None
+
+    changed, removed = requirements_diff(old, dict(old, **{'pinned.txt': ['click==7.1', 'mock==3.0']}))
+    assert dict((key, [str(r) for r in reqs]) for key, reqs in changed.items()) == {'click': ['click', 'click==7.1'],
+                                                                                    'mock': ['mock==3.0']}
+    assert removed == {'six'}
+
+
+def test_install_command():
+    with temp_dir() as cwd:
+        with open('tox.ini', 'w') as fp:
+            fp.write(TOX_INI.format(python=sys.executable))
+
+        tox = ToxIni(str(cwd))
+
+        assert tox.install_command('py', ['a', 'b==1']) == ['python', '-m', 'pip', 'install', 'a', 'b==1']
+
+        os.makedirs('venv/bin')
+        open('venv/bin/pip', 'w').close()
+        assert tox.install_command('style', ['a']) == [os.path.join(str(cwd), 'venv', 'bin', 'pip'), 'install', '-U', 'a']
+
+
+PARALLEL_TOX_INI = """\
+[tox]
+envlist = slow, fast
+
+[testenv]
+basepython = {python}
+envdir = {{toxinidir}}/venv
+commands =
+    python -c "import time; time.sleep(1); print('Slow env output')"
+
+[testenv:fast]
+envdir = {{toxinidir}}/venv-fast
+commands =
+    python -c "print('Fast env output'); import sys; sys.exit({exit_code})"
+
+[testenv:shared]
+commands =
+    python -c "import time; time.sleep(1); print('Shared env output')"
+"""
+
+
+def test_parallel_envs(wst, capsys):
+    with temp_git_repo() as cwd:
+        run([sys.executable, '-m', 'venv', '--without-pip', 'venv'])
+        run([sys.executable, '-m', 'venv', '--without-pip', 'venv-fast'])
+
+        with open('tox.ini', 'w') as fp:
+            fp.write(PARALLEL_TOX_INI.format(python=sys.executable, exit_code=0))
+
+        tox = ToxIni(str(cwd))
+        for env in tox.envlist:
+            write_requirements_fingerprint(tox, env)
+        capsys.readouterr()
+
+        start = time.time()
+        assert set(wst('test --parallel-envs')) == {'slow', 'fast'}
+        assert time.time() - start < 2
+
+        out, _ = capsys.readouterr()
+        assert out.index('fast:\nFast env output') < out.index('slow:\nSlow env output')
+        assert 'fast: Test successful / No output\nslow: Test successful / No output' in out
+
+        with open('tox.ini', 'w') as fp:
+            fp.write(PARALLEL_TOX_INI.format(python=sys.executable, exit_code=1))
+
+        with pytest.raises(SystemExit):
+            wst('test --parallel-envs')
+
+        out, _ = capsys.readouterr()
+        assert 'fast: No test summary found in output' in out
+
+        # Envs that share an envdir are run one after another
+        with open('tox.ini', 'w') as fp:
+            fp.write(PARALLEL_TOX_INI.format(python=sys.executable, exit_code=0))
+        write_requirements_fingerprint(tox, 'shared')
+        capsys.readouterr()
+
+        start = time.time()
+        assert set(wst('test --parallel-envs slow shared fast')) == {'slow', 'shared', 'fast'}
+        assert 2 <= time.time() - start < 3
+
+        out, _ = capsys.readouterr()
+        assert out.index('fast:') < out.index('slow:\nSlow env output') < out.index('shared:\nShared env output')
+
+
+ENV_DEPENDENCIES_TOX_INI = """\
+[testenv]
+envdir = {toxinidir}/venv
+commands =
+    pytest
+
+[testenv:cover]
+commands =
+    pytest --cov .
+
+[testenv:cover-only]
+envdir = {toxinidir}/venv-cover
+commands =
+    coverage run -m pytest
+
+[testenv:docs]
+envdir = {toxinidir}/venv-docs
+commands =
+    sphinx-build docs build
+"""
+
+
+def test_env_dependencies():
+    with temp_dir() as cwd:
+        with open('tox.ini', 'w') as fp:
+            fp.write(ENV_DEPENDENCIES_TOX_INI)
+
+        tox = ToxIni(str(cwd))
+        envs = ['py37', 'style', 'cover', 'cover-only', 'docs']
+        env_commands = dict((env, tox.commands(env)) for env in envs)
+
+        assert env_dependencies(tox, envs, env_commands) == {
+            'py37': [], 'style': ['py37'], 'cover': ['py37', 'style'], 'cover-only': ['cover'], 'docs': []}
+
+
+def test_dependency_graph():
+    with temp_dir() as cwd:
+        for name, requirements in [('foo', ''), ('bar', 'foo>=1\nclick'), ('baz', 'bar')]:
+            run('git init -q ' + name, shell=True)
+            with open(os.path.join(name, 'requirements.txt'), 'w') as fp:
+                fp.write(requirements)
+
+        workspace = str(cwd)
+        foo, bar, baz = [os.path.join(workspace, name) for name in ['foo', 'bar', 'baz']]
+
+        assert dependency_graph(workspace) == {foo: set(), bar: {'foo', 'click'}, baz: {'bar'}}
+        assert os.path.exists(os.path.join(workspace, DEPENDENCY_GRAPH_FILE))
+
+        # Only changed requirement files are re-read
+        cache_file = os.path.join(workspace, DEPENDENCY_GRAPH_FILE)
+        with open(cache_file) as fp:
+            cache = json.load(fp)
+        cache[baz]['requirements'] = ['cached']
+        with open(cache_file, 'w') as fp:
+            json.dump(cache, fp)
+
+        with open(os.path.join(bar, 'requirements.txt'), 'w') as fp:
+            fp.write('foo>=2\nrequests')
+
+        assert dependency_graph(workspace) == {foo: set(), bar: {'foo', 'requests'}, baz: {'cached'}}
+
+
+def test_schedule():
+    dependencies = {'bar': ['foo'], 'baz': ['bar', 'foo'], 'qux': ['foo']}
+    durations = {'foo': 10, 'bar': 5, 'baz': 60, 'qux': 30, 'other': 20}
+
+    assert schedule(['foo', 'bar', 'baz', 'qux', 'other'], dependencies, durations) == [
+        'other', 'foo', 'qux', 'bar', 'baz']
+    assert schedule(['a', 'b'], {'a': ['b'], 'b': ['a']}, {'b': 1}) == ['b', 'a']
+
+
+POOL_TOX_INI = """\
+[tox]
+envlist = py
+skipsdist = true
+
+[testenv]
+basepython = {python}
+deps = -r{{toxinidir}}/requirements.txt
+envdir = {{toxinidir}}/venv
+commands =
+    python -c "import pip; print('Env output from ' + pip.__file__)"
+"""
+
+
+def test_develop_from_env_pool(wst, monkeypatch, capfd):
+    with temp_git_repo() as cwd:
+        monkeypatch.setattr(config.test, 'env_pool_dir', str(cwd / 'pool'))
+        run([sys.executable, '-m', 'venv', str(cwd / 'seed')])
+        pooled_env = add_env(str(cwd / 'seed'))
+        assert pooled_env
+
+        with open('tox.ini', 'w') as fp:
+            fp.write(POOL_TOX_INI.format(python=sys.executable))
+        with open('requirements.txt', 'w') as fp:
+            fp.write('pip\n')
+        capfd.readouterr()
+
+        # Cloned from the pool, and the deps (with tox vars expanded) are installed on top
+        wst('test')
+
+        out, _ = capfd.readouterr()
+        assert 'py: Cloned test environment from ' + pooled_env in out
+        assert 'Env output from ' + str(cwd / 'venv') in out
+        assert not requirements_changed(ToxIni(str(cwd)), 'py')
@@ -0,0 +1,28 @@
+import json
+
+from test_stubs import temp_git_repo
+from utils.process import run
+
+
+def test_trace(wst, capsys):
+    with temp_git_repo():
+        run('git commit --allow-empty -m Dummy')
+        capsys.readouterr()
+
+        wst('--trace trace.json status')
+
+        summary = capsys.readouterr().err
+        assert 'Profile of "wst --debug --trace trace.json status"' in summary
+        assert 'git remote -v' in summary
+
+        with open('trace.json') as fp:
+            events = json.load(fp)['traceEvents']
+
+        subprocesses = [e for e in events if e.get('cat') == 'subprocess']
+        assert 'git remote -v' in [e['args']['cmd'] for e in subprocesses]
+        assert all(e['args']['exit_code'] == 0 and e['dur'] >= 0 for e in subprocesses)
+        assert [e for e in events if e.get('cat') == 'python']
+
+        wst('--profile log --oneline -1')  # Subprocess that is not run silently
+
+        assert 'git log --decorate --oneline -1' in capsys.readouterr().err
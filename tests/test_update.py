@@ -0,0 +1,85 @@
+import json
+import os
+
+from test_stubs import temp_dir
+from utils.process import run
+from workspace import scm
+from workspace.scm import UpdateError
+
+
+def test_update_skip_unchanged(wst, capsys):
+    with temp_dir():
+        for name in ['foo', 'bar']:
+            run('git init -q --bare {0}.git; git clone -q {0}.git {0}-src'.format(name), shell=True)
+            run('git commit -q --allow-empty -m First; git push -q origin master', cwd=name + '-src', shell=True)
+
+        os.mkdir('workspace')
+        os.chdir('workspace')
+        run('git clone -q ../foo.git; git clone -q ../bar.git', shell=True)
+        run('git commit -q --allow-empty -m Second; git push -q origin master', cwd='../bar-src', shell=True)
+        capsys.readouterr()
+
+        wst('--progress-file ../progress.jsonl up --skip-unchanged')
+
+        assert 'Skipped 1 of 2 products as they are up to date' in capsys.readouterr().out
+        assert 'Second' in run('git log --oneline', cwd='bar', return_output=True)
+
+        with open('../progress.jsonl') as fp:
+            events = [json.loads(line) for line in fp]
+        assert sorted((e['event'], e['item']) for e in events) == [
+            ('finish', 'bar'), ('finish', 'foo'), ('start', 'bar'), ('start', 'foo')]
+        assert all(e['title'] == 'Update' for e in events)
+
+        os.chdir('foo')
+        wst('up -s')
+        assert 'Already up to date' in capsys.readouterr().out
+
+
+def test_update_retries_transient_errors(wst, monkeypatch):
+    attempts = []
+
+    def update_repo(repo, **kwargs):
+        attempts.append(os.path.basename(repo))
+        if attempts.count(os.path.basename(repo)) == 1:
+            raise UpdateError('Failed to pull from remote(s): origin', {'origin': 'Connection reset by peer'})
+        return True
+
+    monkeypatch.setattr('workspace.commands.update._update_repo', update_repo)
+    monkeypatch.setattr('workspace.commands.update.sleep', lambda seconds: None)
+
+    with temp_dir():
+        for name in ['foo', 'bar']:
+            run('git init -q ' + name, shell=True)
+
+        wst('up')
+
+    assert sorted(attempts) == ['bar', 'bar', 'foo', 'foo']
+
+
+def test_update_retries_on_child_branch(wst, monkeypatch):
+    failures = []
+
+    def update_repo(repo, **kwargs):
+        if not failures and os.path.basename(repo) == 'foo':
+            failures.append(repo)
+            raise UpdateError('Failed to pull from remote(s): origin', {'origin': 'Connection reset by peer'})
+        return scm.update_repo(repo, **kwargs)
+
+    monkeypatch.setattr('workspace.commands.update.update_repo', update_repo)
+    monkeypatch.setattr('workspace.commands.update.sleep', lambda seconds: None)
+
+    with temp_dir():
+        run('git init -q --bare foo.git; git clone -q foo.git foo-src', shell=True)
+        run('git commit -q --allow-empty -m First; git push -q origin master', cwd='foo-src', shell=True)
+
+        os.mkdir('workspace')
+        os.chdir('workspace')
+        run('git clone -q ../foo.git; git init -q bar', shell=True)
+        run('git checkout -q -b feature@master; git commit -q --allow-empty -m Feature', cwd='foo', shell=True)
+        run('git commit -q --allow-empty -m Second; git push -q origin master', cwd='../foo-src', shell=True)
+
+        wst('up')
+
+        assert len(failures) == 1
+        assert run('git rev-parse --abbrev-ref HEAD', cwd='foo', return_output=True).strip() == 'feature@master'
+        assert run('git log --format=%s', cwd='foo', return_output=True).split() == ['Feature', 'Second', 'First']
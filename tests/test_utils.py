@@ -1,4 +1,17 @@
-from workspace.utils import shortest_id
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import click
+
+from test_stubs import temp_dir
+import workspace.utils
+from workspace.utils import (AdaptiveLimit, add_progress_info, invalidate_parent_paths, ordered_async_call,
+                             parallel_call, parent_path_with_dir, shortest_id)
 
 
 def test_shortest_id():
@@ -6,3 +19,155 @@ def test_shortest_id():
     assert shortest_id('apple', ['apricot', 'banana']) == 'app'
     assert shortest_id('apple', ['apple seed', 'banana']) == 'apple'
     assert shortest_id('apple', ['apple', 'banana']) == 'a'
+
+
+def test_parallel_call():
+    def call(x, y=1):
+        if x == 3:
+            raise Exception('No threes')
+        if x == 4:
+            sys.exit(1)
+        return x * y
+
+    done = []
+    results = parallel_call(call, [1, (2, 10), 3, 4], callback=done.append, workers=2)
+
+    assert results == {1: 1, (2, 10): 20, 3: 'No threes', 4: False}
+    assert sorted(done) == [1, 20]
+
+
+def test_parallel_call_with_dependencies():
+    started = []
+
+    def call(x):
+        started.append(x)
+        return x != 'b'
+
+    # c depends on a, d on b (which fails), and e on d
+    dependencies = {'c': ['a'], 'd': ['b'], 'e': ['d', 'x']}
+    results = parallel_call(call, ['e', 'd', 'c', 'b', 'a'], workers=5, dependencies=dependencies,
+                            failed=lambda result: result is False)
+
+    assert results == {'a': True, 'b': False, 'c': True, 'd': None, 'e': None}
+    assert started.index('a') < started.index('c')
+    assert 'd' not in started and 'e' not in started
+
+    # Dependencies are still waited on without failed
+    started[:] = []
+    results = parallel_call(call, ['e', 'd', 'c', 'b', 'a'], workers=5, dependencies=dependencies)
+
+    assert results == {'a': True, 'b': False, 'c': True, 'd': True, 'e': True}
+    assert started.index('b') < started.index('d') < started.index('e')
+
+    # Cycles do not block
+    assert parallel_call(call, ['a', 'c'], dependencies={'a': ['c'], 'c': ['a']}) == {'a': True, 'c': True}
+
+
+def test_parallel_call_progress_events(monkeypatch):
+    def call(x):
+        add_progress_info(bytes_fetched=x)
+        add_progress_info(bytes_fetched=x)
+        return x != 3
+
+    with temp_dir():
+        monkeypatch.setattr(workspace.utils, 'progress_file', 'progress.jsonl')
+        parallel_call(call, [1, 2, 3], progress_title='Test', label=lambda x: 'item-%d' % x)
+
+        with open('progress.jsonl') as fp:
+            events = [json.loads(line) for line in fp]
+
+    assert sorted((e['event'], e['item']) for e in events) == [
+        ('finish', 'item-1'), ('finish', 'item-2'), ('finish', 'item-3'),
+        ('start', 'item-1'), ('start', 'item-2'), ('start', 'item-3')]
+    finished = dict((e['item'], e) for e in events if e['event'] == 'finish')
+    assert finished['item-2']['bytes_fetched'] == 4
+    assert finished['item-2']['success'] is True
+    assert finished['item-3']['success'] is False
+    assert all(e['title'] == 'Test' and e['duration'] >= 0 for e in finished.values())
+
+
+def test_parallel_call_live_progress(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(workspace.utils, '_is_tty', lambda: True)
+    monkeypatch.setattr(sys, 'stdout', stdout)
+
+    def call(x):
+        time.sleep(x / 10.0)
+        click.echo('Working on %d' % x)
+        return x
+
+    parallel_call(call, [1, 2, 3], show_progress=True, progress_title='Test')
+
+    assert sys.stdout is stdout
+
+    # Output is above the display, so it is not erased when the display is cleared.
+    screen = ['']
+    for token in re.split(r'(\x1b\[\d+F\x1b\[J|\n)', stdout.getvalue()):
+        if token == '\n':
+            screen.append('')
+        elif token.startswith('\x1b'):
+            del screen[-int(re.match(r'\x1b\[(\d+)F', token).group(1)) - 1:]
+            screen.append('')
+        else:
+            screen[-1] += token
+    assert screen == ['Working on 1', 'Working on 2', 'Working on 3', '']
+
+
+def test_ordered_async_call():
+    async def call(x):
+        await asyncio.sleep(x / 100.0)
+        return x * 2
+
+    assert list(ordered_async_call(call, [3, 1, 2], workers=2)) == [(3, 6), (1, 2), (2, 4)]
+
+
+def test_parent_path_with_dir():
+    with temp_dir() as tmpdir:
+        tmpdir = str(tmpdir)
+        os.makedirs('repo/.git')
+        os.makedirs('repo/src/pkg')
+        os.makedirs('other')
+
+        repo = os.path.join(tmpdir, 'repo')
+        assert parent_path_with_dir('.git', 'repo/src/pkg') == repo
+        assert parent_path_with_dir('.git', 'other') is False
+
+        os.chdir('repo/src')
+        assert parent_path_with_dir('.git') == repo
+        os.chdir(tmpdir)
+
+        # Cached until invalidated
+        os.makedirs('other/.git')
+        assert parent_path_with_dir('.git', 'other') is False
+        invalidate_parent_paths(os.path.join(tmpdir, 'other'))
+        assert parent_path_with_dir('.git', 'other') == os.path.join(tmpdir, 'other')
+
+        os.rename('repo/.git', 'repo/git')
+        assert parent_path_with_dir('.git', 'repo/src/pkg') == repo
+        invalidate_parent_paths(repo)
+        assert parent_path_with_dir('.git', 'repo/src') is False
+        assert parent_path_with_dir('.git', 'repo/src/pkg') is False
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(8)
+    assert limit.limit == 4
+
+    for _ in range(30):
+        limit.succeeded()
+    assert limit.limit == 8
+
+    limit.failed()
+    limit.failed()
+    limit.failed()
+    assert limit.limit == 1
+
+    active = []
+
+    def call(x):
+        with limit:
+            active.append(limit.active)
+            time.sleep(0.01)
+
+    parallel_call(call, range(5), workers=5)
+    assert active == [1] * 5
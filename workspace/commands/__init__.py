@@ -2,7 +2,7 @@ class AbstractCommand(object):
     """
       Change the docstring of the command class to set the description of the command.
     """
-    #: CLI command alias
+    #: CLI command alias. Built-in command aliases are defined in :data:`workspace.controller.COMMANDS`
     alias = None
 
     def __init__(self, **kwargs):
@@ -1,13 +1,18 @@
 from __future__ import absolute_import
 import logging
 import os
+import sys
+import time
 
 import click
 
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import expand_product_groups
 from workspace.scm import (checkout_product, checkout_branch, all_branches, checkout_files, is_repo,
-                           product_checkout_path, product_name, upstream_remote, all_remotes, update_tags)
+                           product_checkout_path, product_name, upstream_remote, all_remotes, update_tags,
+                           product_url_resolver, evict_reference_repos, PRODUCT_NAME_RE, SCMError)
+from workspace.utils import parallel_call
+
 log = logging.getLogger(__name__)
 
 
@@ -17,13 +22,21 @@ class Checkout(AbstractCommand):
 
       :param list target: List of products (git repository URLs) to checkout. When inside a git repo,
                           checkout the branch or revert changes for file(s).
+      :param int workers: Number of products to checkout in parallel.
+      :param int depth: Create shallow clones with history truncated to the number of commits for faster checkout.
+      :param str filter: Create partial clones with the object filter, such as "blob:none" to only fetch file
+                         contents when needed.
     """
-    alias = 'co'
 
     @classmethod
     def arguments(cls):
         _, docs = cls.docs()
-        return [cls.make_args('target', nargs='+', help=docs['target'])]
+        return [
+          cls.make_args('target', nargs='+', help=docs['target']),
+          cls.make_args('-j', '--workers', type=int, default=10, help=docs['workers']),
+          cls.make_args('--depth', type=int, help=docs['depth']),
+          cls.make_args('--filter', metavar='FILTER_SPEC', help=docs['filter'])
+        ]
 
     def run(self):
         if is_repo():
@@ -56,11 +69,17 @@ class Checkout(AbstractCommand):
             checkout_files(self.target)
             return
 
-        product_urls = expand_product_groups(self.target)
+        product_urls = [url.strip('/') for url in expand_product_groups(self.target)]
+        started = time.time()
 
-        for product_url in product_urls:
-            product_url = product_url.strip('/')
+        try:
+            self._checkout_products(product_urls)
+        finally:
+            evict_reference_repos(used_since=started)
 
+    def _checkout_products(self, product_urls):
+        if len(product_urls) == 1:
+            product_url = product_urls[0]
             product_path = product_checkout_path(product_url)
 
             if os.path.exists(product_path):
@@ -68,4 +87,51 @@ class Checkout(AbstractCommand):
             else:
                 click.echo('Checking out ' + product_url)
 
-            checkout_product(product_url, product_path)
+            checkout_product(product_url, product_path, depth=self.depth, filter=self.filter)
+            return
+
+        click.echo('Checking out {} products'.format(len(product_urls)))
+
+        # Resolve product names to URLs with as few searches as possible. Errors are reported per product later.
+        names = [url for url in product_urls if PRODUCT_NAME_RE.match(url) and
+                 not os.path.exists(product_checkout_path(url))]
+        if names:
+            try:
+                product_url_resolver().resolve_all(names)
+            except SCMError as e:
+                log.debug(e)
+
+        def show_completed(completed, all_urls):
+            return '{}/{} completed'.format(len(completed), len(all_urls))
+
+        results = parallel_call(self._checkout_product, product_urls, callback=self._show_result,
+                                workers=self.workers or 10, show_progress=show_completed, progress_title='Checkout',
+                                label=product_name)
+
+        # Result is False if the checkout exited instead of raising
+        failures = [(url, result[1] if result else 'Exited with error') for url, result in sorted(results.items())
+                    if not result or not result[0]]
+
+        if failures:
+            click.echo('Failed to checkout {} of {} products:'.format(len(failures), len(product_urls)))
+            for url, error in failures:
+                click.echo('  - {}: {}'.format(product_name(url), error))
+            sys.exit(1)
+
+    def _checkout_product(self, product_url):
+        """ Checkout or update the product and return a tuple of (success, result message) """
+        product_path = product_checkout_path(product_url)
+        action = 'Updated' if os.path.exists(product_path) else 'Checked out'
+
+        try:
+            checkout_product(product_url, product_path, depth=self.depth, filter=self.filter, quiet=True)
+            return True, '{} {}'.format(action, product_name(product_path))
+
+        except Exception as e:
+            log.debug(e, exc_info=True)
+            return False, str(e)
+
+    def _show_result(self, result):
+        success, message = result
+        if success:
+            click.echo(message)
@@ -5,12 +5,13 @@ import shutil
 from time import time
 
 import click
-from utils.process import silent_run
 
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import expand_product_groups
 from workspace.config import config
-from workspace.scm import workspace_path, product_name, repos, stat_repo, all_branches, repo_path
+from workspace.scm import (workspace_path, product_name, repos, async_stat_repo, async_all_branches, repo_path,
+                           silent_run)
+from workspace.utils import invalidate_parent_paths, ordered_async_call
 
 log = logging.getLogger(__name__)
 
@@ -60,19 +61,25 @@ class Clean(AbstractCommand):
                     keep_time = time() - config.clean.remove_products_older_than_days * 86400
 
                 removed_products = []
+                remove_repos = [repo for repo in repos(path)
+                                if keep_products and product_name(repo) not in keep_products or
+                                keep_time and os.stat(repo).st_mtime < keep_time]
 
-                for repo in repos(path):
+                for repo, is_clean in ordered_async_call(self._is_clean, remove_repos):
                     name = product_name(repo)
-                    modified_time = os.stat(repo).st_mtime
-                    if keep_products and name not in keep_products or keep_time and modified_time < keep_time:
-                        status = stat_repo(repo, return_output=True)
-                        if (not status or 'nothing to commit' in status and
-                                ('working directory clean' in status or 'working tree clean' in status) and
-                                len(all_branches(repo)) <= 1):
-                            shutil.rmtree(repo)
-                            removed_products.append(name)
-                        else:
-                            click.echo('  - Skipping "%s" as it has changes that may not be committed' % name)
+                    if is_clean:
+                        shutil.rmtree(repo)
+                        invalidate_parent_paths(repo)
+                        removed_products.append(name)
+                    else:
+                        click.echo('  - Skipping "%s" as it has changes that may not be committed' % name)
 
                 if removed_products:
                     click.echo('Removed ' + ', '.join(removed_products))
+
+    async def _is_clean(self, repo):
+        """ Check if the repo has no changes or branches that may not be committed """
+        status = await async_stat_repo(repo)
+        return (not status or 'nothing to commit' in status and
+                ('working directory clean' in status or 'working tree clean' in status) and
+                len(await async_all_branches(repo)) <= 1)
@@ -8,8 +8,8 @@ import click
 from workspace.commands import AbstractCommand
 from workspace.config import config
 from workspace.scm import local_commit, add_files, checkout_branch,\
-    create_branch, all_branches, diff_branch, current_branch, remove_branch, hard_reset, \
-    commit_logs, parent_branch
+    create_branch, all_branches, current_branch, remove_branch, hard_reset, \
+    iter_commits, parent_branch
 from workspace.utils import prompt_with_editor
 
 log = logging.getLogger(__name__)
@@ -33,7 +33,6 @@ class Commit(AbstractCommand):
       :param bool skip_auto_branch: Skip automatic branch creation from commit msg
       :param list files: List of files to add instead of all files.
     """
-    alias = 'ci'
 
     @classmethod
     def arguments(cls):
@@ -60,35 +59,32 @@ class Commit(AbstractCommand):
             is_child_branch = base_branch = parent_branch(self.branch)
 
             if self.discard:
-                changes = commit_logs(self.discard) if not is_child_branch else diff_branch(self.branch,
-                                                                                            left_branch=base_branch)
+                # One more than discard is enough to know if all commits in the child branch are discarded
+                revision_range = '{}..{}'.format(base_branch, self.branch) if is_child_branch else None
+                changes = list(iter_commits(revision_range, limit=self.discard + 1))
             else:
-                changes = commit_logs(1)
-            changes = [_f for _f in changes.split('commit ') if _f]
+                changes = list(iter_commits(limit=1))
 
             if self.discard and len(changes) <= self.discard and is_child_branch:
                 checkout_branch(base_branch)
                 remove_branch(self.branch, raises=True, force=True)
 
-            else:
-                match = re.match('([a-f0-9]+)(?: \(.*\))\n', changes[0])
-
-                if match:
-                    last_commit = match.group(1)
+            elif changes:
+                last_commit = changes[0].sha
 
-                    if self.move:
-                        cur_branch = current_branch()
-                        create_branch(self.branch)
-                        checkout_branch(cur_branch)
-                        click.echo('Moved {} to {}'.format(last_commit[:7], self.branch))
-                        hard_reset(last_commit + '~1')
-
-                    else:
-                        checkout_branch(self.branch)
-                        hard_reset(last_commit + '~' + str(self.discard))
+                if self.move:
+                    cur_branch = current_branch()
+                    create_branch(self.branch)
+                    checkout_branch(cur_branch)
+                    click.echo('Moved {} to {}'.format(last_commit[:7], self.branch))
+                    hard_reset(last_commit + '~1')
 
                 else:
-                    log.error('Odd. No commit hash found in: %s', changes[0])
+                    checkout_branch(self.branch)
+                    hard_reset(last_commit + '~' + str(self.discard))
+
+            else:
+                log.error('Odd. No commits found to %s', 'discard' if self.discard else 'move')
 
         else:
             if not self.skip_style_check and (self.test or self.push) and self.commander.command('test').supports_style_check():
@@ -1,11 +1,12 @@
 from __future__ import absolute_import
+from functools import partial
 import logging
 import os
 
 from workspace.commands import AbstractCommand
-from workspace.commands.helpers import ProductPager
-from workspace.scm import diff_repo, repos, product_name, current_branch, parent_branch
-from workspace.utils import log_exception
+from workspace.commands.helpers import ProductPager, pager_command
+from workspace.scm import async_diff_repo, repos, product_name, async_current_branch, parent_branch
+from workspace.utils import log_exception, ordered_async_call
 
 log = logging.getLogger(__name__)
 
@@ -17,8 +18,8 @@ class Diff(AbstractCommand):
       :param str context: Show diff for context (i.e. branch or file)
       :param bool parent: Diff against the parent branch. If there is not parent, defaults to master.
       :param bool name_only: List file names only. Git only.
+      :param int workers: Number of products to diff in parallel.
     """
-    alias = 'di'
 
     @classmethod
     def arguments(cls):
@@ -26,7 +27,8 @@ class Diff(AbstractCommand):
         return [
           cls.make_args('context', nargs='?', help=docs['context']),
           cls.make_args('-p', '--parent', action='store_true', help=docs['parent']),
-          cls.make_args('-l', '--name-only', action='store_true', help=docs['name_only'])
+          cls.make_args('-l', '--name-only', action='store_true', help=docs['name_only']),
+          cls.make_args('-j', '--workers', type=int, default=10, help=docs['workers'])
         ]
 
     def run(self):
@@ -38,14 +40,24 @@ class Diff(AbstractCommand):
         optional = len(scm_repos) == 1
         pager = ProductPager(optional=optional)
 
-        for repo in scm_repos:
-            with log_exception():
-                cur_branch = current_branch(repo)
-                branch = (parent_branch(cur_branch) or 'master') if self.parent else None
-                color = not pager.pager or 'less' in pager.pager.args
-                output = diff_repo(repo, branch=branch, context=self.context, return_output=True,
-                                   name_only=self.name_only, color=color)
-                if output:
-                    pager.write(product_name(repo), output, cur_branch)
+        # Only color if output goes to the terminal (single product) or to a pager that supports it.
+        color = not self.name_only and (optional or 'less' in pager_command())
+        diff = partial(self._diff_repo, color=color)
+
+        # Products are diffed concurrently, but paged in order as soon as all products before them are done.
+        for repo, result in ordered_async_call(diff, scm_repos, workers=self.workers or 10):
+            if result:
+                cur_branch, output = result
+                pager.write(product_name(repo), output, cur_branch)
 
         pager.close_and_wait()
+
+    async def _diff_repo(self, repo, color=False):
+        """ Returns a tuple of (current branch, diff output) for the repo, or None if there is no diff. """
+        with log_exception():
+            cur_branch = await async_current_branch(repo)
+            branch = (parent_branch(cur_branch) or 'master') if self.parent else None
+            output = await async_diff_repo(repo, branch=branch, context=self.context, name_only=self.name_only,
+                                           color=color)
+            if output:
+                return cur_branch, output
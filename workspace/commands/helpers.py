@@ -2,6 +2,7 @@ import logging
 import os
 import re
 import subprocess
+import sys
 
 from localconfig import LocalConfig
 
@@ -15,6 +16,7 @@ class ToxIni(LocalConfig):
     """ Represents tox.ini """
 
     VAR_RE = re.compile(r'{(\w+)}')
+    PYTHON_ENV_RE = re.compile(r'^py(\d)(\d+)$')
 
     def __init__(self, path=None, tox_ini=None):
         """
@@ -85,6 +87,47 @@ class ToxIni(LocalConfig):
             dir = os.path.join(dir, script)
         return dir
 
+    def deps(self, env):
+        """ List of deps for the env from "[testenv:env] deps" or "[testenv] deps" """
+        deps = self.get(self.envsection(env), 'deps', self.get(self.envsection(), 'deps', ''))
+        return [d.strip() for d in str(deps).split('\n') if d.strip()]
+
+    def basepython(self, env):
+        """
+        Python to create the env with from basepython, or based on the env name (e.g. python3.7 for py37). Otherwise,
+        it is the Python that tox runs with, which is assumed to be the same as ours.
+        """
+        python = self.get(self.envsection(env), 'basepython', self.get(self.envsection(), 'basepython', None))
+
+        if not python:
+            match = self.PYTHON_ENV_RE.match(env)
+            python = 'python{}.{}'.format(*match.groups()) if match else sys.executable
+
+        return python
+
+    def install_command(self, env, packages):
+        """ Command to install the packages into the env per install_command, with pip from the env's bin dir """
+        command = self.get(self.envsection(env), 'install_command',
+                           self.get(self.envsection(), 'install_command', 'python -m pip install {opts} {packages}'))
+        command = [arg for arg in self.expand_vars(str(command)).split() if arg != '{opts}']
+
+        if os.path.exists(self.bindir(env, command[0])):
+            command[0] = self.bindir(env, command[0])
+
+        index = command.index('{packages}') if '{packages}' in command else len(command)
+        return command[:index] + list(packages) + command[index + 1:]
+
+    def usedevelop(self, env):
+        """ Checks if the product is installed in develop mode in the env per usedevelop """
+        usedevelop = self.get(self.envsection(env), 'usedevelop', self.get(self.envsection(), 'usedevelop', False))
+        return str(usedevelop).lower() == 'true'
+
+    def skipsdist(self, env):
+        """ Checks if installing the product in the env is skipped per skipsdist """
+        skipsdist = self.get(self.envsection(env), 'skipsdist',
+                             self.get(self.envsection(), 'skipsdist', self.get('tox', 'skipsdist', False)))
+        return str(skipsdist).lower() == 'true'
+
     def commands(self, env):
         envsection = self.envsection(env)
         commands = self.get(envsection, 'commands', self.get('testenv', 'commands', 'pytest {env:PYTESTARGS:}'))
@@ -128,8 +171,8 @@ class ProductPager(object):
             self.pager.wait()
 
 
-def create_pager(highlight_text=None):
-    """ Returns a pipe to PAGER or "less" """
+def pager_command(highlight_text=None):
+    """ Returns the command for PAGER or "less" """
     pager_cmd = os.environ.get('PAGER')
 
     if not pager_cmd:
@@ -137,7 +180,12 @@ def create_pager(highlight_text=None):
         if highlight_text:
             pager_cmd.extend(['-p', highlight_text])
 
-    pager = subprocess.Popen(pager_cmd, stdin=subprocess.PIPE)
+    return pager_cmd
+
+
+def create_pager(highlight_text=None):
+    """ Returns a pipe to PAGER or "less" """
+    pager = subprocess.Popen(pager_command(highlight_text), stdin=subprocess.PIPE)
 
     return pager
 
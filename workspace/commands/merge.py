@@ -5,11 +5,10 @@ import sys
 import textwrap
 
 import click
-import git
 from utils.process import run as process_run
 from workspace.commands import AbstractCommand
 from workspace.config import config
-from workspace.scm import checkout_branch, current_branch, merge_branch, repo_path
+from workspace.scm import checkout_branch, commits, current_branch, is_dirty, merge_branch, repo_path
 
 log = logging.getLogger(__name__)
 
@@ -59,13 +58,13 @@ class Merge(AbstractCommand):
 
     def run(self):
         current = current_branch()
-        repo = git.Repo(path=repo_path())
+        repo = repo_path()
 
         if self.branch and self.downstreams:
             log.error('Branch and --downstreams are mutually exclusive. Please use one or the other.')
             sys.exit(1)
 
-        if repo.is_dirty(untracked_files=True):
+        if is_dirty(repo):
             log.error(
                 'Your repo has untracked or modified files in working dir or in staging index. Please cleanup before doing merge')
             sys.exit(1)
@@ -110,9 +109,9 @@ class Merge(AbstractCommand):
             for branch in downstream_branches:
                 checkout_branch(branch)
 
-                commits = self._unmerged_commits(repo, last, branch)
+                unmerged = self._unmerged_commits(repo, last, branch)
 
-                if self.quiet and not commits:
+                if self.quiet and not unmerged:
                     last = branch
                     continue
 
@@ -126,8 +125,8 @@ class Merge(AbstractCommand):
 
                 else:
                     if self.allow_commits:
-                        if commits:
-                            for commit in commits:
+                        if unmerged:
+                            for commit in map(str, unmerged):
                                 # Not performant / ok as # of allow_commits should be low
                                 allowed_commit = (' Merge branch ' in commit
                                                   or ' Merge commit ' in commit
@@ -138,7 +137,7 @@ class Merge(AbstractCommand):
                                     click.echo('  {}'.format(commit))
                                     raise NotAllowedCommit(commit)
 
-                    self.merge_commits(last, commits, self.skip_commits, self.user)
+                    self.merge_commits(last, unmerged, self.skip_commits, self.user)
 
                     if self.validation:
                         process_run(self.validation)
@@ -165,7 +164,7 @@ class Merge(AbstractCommand):
         to the class else if a match is found it will merge that specific commit with `ours` strategy.
 
         :param branch_name: Name of the source branch
-        :param unmerged_commits: List of unmerged_commits
+        :param unmerged_commits: List of unmerged :class:`workspace.scm.Commit`
         :param skip_commits: [Optional] Enables per commit based merge. Accepts a list of string or substrings from a
         commit message used to skip the commits during pint merge. Commits that matches the list of strings are skipped
         using merge with 'ours' strategy.
@@ -183,8 +182,8 @@ class Merge(AbstractCommand):
 
         # For each commit, inspect the message and accordingly run the merge strategy
         for unmerged_commit in unmerged_commits_list:
-            commit_hash = unmerged_commit.split()[0]
-            if self.should_use_ours_strategy(unmerged_commit, skip_commits):
+            commit_hash = unmerged_commit.short_sha
+            if self.should_use_ours_strategy(str(unmerged_commit), skip_commits):
                 merge_branch(branch_name, commit=commit_hash, strategy="ours", user=user)
             else:
                 merge_branch(branch_name, commit=commit_hash, strategy=self.strategy, user=user)
@@ -199,19 +198,20 @@ class Merge(AbstractCommand):
 
     def get_unmerged_commits(self, repo, source_branch, target_branch):
         """ Show commit diffs between from_branch to target_branch """
-        commits = self._unmerged_commits(repo, source_branch, target_branch)
-        if commits:
+        unmerged = self._unmerged_commits(repo, source_branch, target_branch)
+        if unmerged:
             click.echo('The following commit(s) would be merged:')
-            click.echo(textwrap.indent('\n'.join(commits), '  '))
+            click.echo(textwrap.indent('\n'.join(map(str, unmerged)), '  '))
         else:
             click.echo('Already up-to-date.')
-        return commits
+        return unmerged
 
     def _unmerged_commits(self, repo, from_branch, target_branch):
+        """ Returns a list of :class:`workspace.scm.Commit` in from_branch that are not in target_branch, newest first """
         unmerged_commits = []
-        commits = repo.git.log('{}..{}'.format(target_branch, from_branch), oneline=True)
-        for commit in commits.split('\n'):
+        for commit in commits('{}..{}'.format(target_branch, from_branch), repo=repo):
             # Skip on 'Merge' commits to prevent merge of merge commits
-            if not ('Merge branch' in commit or 'Merge commit' in commit or 'Merge pull request' in commit):
+            if not ('Merge branch' in commit.subject or 'Merge commit' in commit.subject
+                    or 'Merge pull request' in commit.subject):
                 unmerged_commits.append(commit)
         return unmerged_commits
@@ -9,10 +9,10 @@ import sys
 import click
 from localconfig import LocalConfig
 from six.moves import range
-from utils.process import run, silent_run
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import ToxIni
-from workspace.scm import repo_check, repo_path, commit_logs, extract_commit_msgs
+from workspace.config import config
+from workspace.scm import iter_commits, repo_check, repo_path, run, silent_run
 
 log = logging.getLogger(__name__)
 new_version = None  # Doesn't work if it is in bump_version
@@ -131,11 +131,12 @@ class Publish(AbstractCommand):
                            skip_style_check=True)
 
     def changes_since_last_publish(self):
-        commit_msgs = extract_commit_msgs(commit_logs(limit=100, repo=repo_path()), True)
         changes = []
         published_version = None
 
-        for msg in commit_msgs:
+        # Stops reading the log at the last publish, or at the max number of changes if it was never published
+        for commit in iter_commits(repo=repo_path(), limit=config.publish.max_changes):
+            msg = '\n'.join(line for line in commit.message.split('\n') if line)  # Blank lines break changelog bullets
             if msg.startswith(PUBLISH_VERSION_PREFIX):
                 published_version = msg.split(PUBLISH_VERSION_PREFIX)[-1]
                 break
@@ -1,17 +1,18 @@
 from __future__ import absolute_import
+from functools import partial
 import os
 import logging
 
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import ProductPager
-from workspace.scm import stat_repo, repos, product_name, all_branches, is_repo, all_remotes
+from workspace.scm import async_stat_repo, repos, product_name, async_all_branches, is_repo, all_remotes
+from workspace.utils import ordered_async_call
 
 log = logging.getLogger(__name__)
 
 
 class Status(AbstractCommand):
     """ Show status on current product or all products in workspace """
-    alias = 'st'
 
     def run(self):
 
@@ -21,28 +22,36 @@ class Status(AbstractCommand):
             optional = len(scm_repos) == 1
             pager = ProductPager(optional=optional)
 
-            for repo in scm_repos:
-                stat_path = os.getcwd() if in_repo else repo
-                output = stat_repo(stat_path, return_output=True, with_color=True)
-                nothing_to_commit = ('nothing to commit' in output and
-                                     'Your branch is ahead of' not in output and
-                                     'Your branch is behind' not in output)
+            # Repos are checked concurrently, but shown in order as soon as all repos before them are done.
+            repo_status = partial(self._repo_status, in_repo=in_repo, single_repo=len(scm_repos) == 1)
 
-                branches = all_branches(repo, verbose=True)
-                child_branches = [b for b in branches if '@' in b]
-
-                if len(child_branches) >= 1 or len(scm_repos) == 1:
-                    show_branches = branches if len(scm_repos) == 1 else child_branches
-                    remotes = all_remotes() if len(scm_repos) == 1 else []
-                    remotes = '\n# Remotes: {}'.format(' '.join(remotes)) if len(remotes) > 1 else ''
-
-                    if nothing_to_commit:
-                        output = '# Branches: {}{}'.format(' '.join(show_branches), remotes)
-                        nothing_to_commit = False
-                    elif len(show_branches) > 1:
-                        output = '# Branches: {}{}\n#\n{}'.format(' '.join(show_branches), remotes, output)
-
-                if output and not nothing_to_commit:
+            for repo, output in ordered_async_call(repo_status, scm_repos):
+                if output:
                     pager.write(product_name(repo), output)
         finally:
             pager.close_and_wait()
+
+    async def _repo_status(self, repo, in_repo, single_repo):
+        """ Returns the status output to show for the repo, or None if there is nothing to show. """
+        stat_path = os.getcwd() if in_repo else repo
+        output = await async_stat_repo(stat_path, with_color=True)
+        nothing_to_commit = ('nothing to commit' in output and
+                             'Your branch is ahead of' not in output and
+                             'Your branch is behind' not in output)
+
+        branches = await async_all_branches(repo, verbose=True)
+        child_branches = [b for b in branches if '@' in b]
+
+        if len(child_branches) >= 1 or single_repo:
+            show_branches = branches if single_repo else child_branches
+            remotes = all_remotes() if single_repo else []
+            remotes = '\n# Remotes: {}'.format(' '.join(remotes)) if len(remotes) > 1 else ''
+
+            if nothing_to_commit:
+                output = '# Branches: {}{}'.format(' '.join(show_branches), remotes)
+                nothing_to_commit = False
+            elif len(show_branches) > 1:
+                output = '# Branches: {}{}\n#\n{}'.format(' '.join(show_branches), remotes, output)
+
+        if output and not nothing_to_commit:
+            return output
@@ -1,12 +1,16 @@
 from __future__ import absolute_import
 from __future__ import print_function
 import argparse
+import hashlib
 import logging
 import os
 import pkg_resources
 import re
+import shlex
+import shutil
 import sys
 import tempfile
+import time
 
 import click
 import json
@@ -15,6 +19,7 @@ from utils.process import run
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import expand_product_groups, ToxIni
 from workspace.config import config
+from workspace.envpool import add_env, clone_env, closest_env
 from workspace.scm import (product_name, repo_path, product_repos, product_path, repos,
                            workspace_path, current_branch, project_path)
 from workspace.utils import log_exception, parallel_call
@@ -23,6 +28,20 @@ log = logging.getLogger(__name__)
 
 TEST_RE = re.compile('\d+ (?:passed|error|failed|xfailed).* in [\d\.]+ seconds')
 BUILD_RE = re.compile('BUILD SUCCESSFUL')
+COMMENT_RE = re.compile(r'(?:^|\s)#.*$')
+#: Commands that write coverage data into the repo, such as `pytest --cov` or `coverage run`
+COVERAGE_RE = re.compile(r'(?:--cov\b|\bcoverage\b)')
+
+#: Files in the repo with requirements that are installed into the test environment
+REQUIREMENTS_FILES = ['requirements.txt', 'pinned.txt']
+
+#: File in the envdir with the fingerprint of the requirements that the env was last developed with, per env
+FINGERPRINT_FILE = '.wst-fingerprint.json'
+
+#: Files relative to the workspace that cache the requirements of each product, and how long their tests took.
+#: They are in the same dir as the workspace index.
+DEPENDENCY_GRAPH_FILE = os.path.join('.wst', 'dependencies.json')
+TEST_DURATIONS_FILE = os.path.join('.wst', 'test-durations.json')
 
 
 class Test(AbstractCommand):
@@ -38,13 +57,22 @@ class Test(AbstractCommand):
       :param bool show_dependencies: Show where product dependencies are installed from and their versions.
       :param bool test_dependents: Run tests in this product and in checked out products that depends on this product.
                                    This product must be installed as editable in its dependents for the results to be useful.
-                                   Most args are ignored when this is used.
+                                   Most args are ignored when this is used. Products are tested in dependency order,
+                                   with the ones that took the longest last time first.
+      :param bool stop_early: Modifier for test_dependents. Test products only after the products they depend on
+                              passed, and skip them if any failed.
       :param bool redevelop: Redevelop the test environment by installing on top of existing one.
-                             This is implied if test environment does not exist, or whenever requirements.txt or
-                             pinned.txt is modified after the environment was last updated.
+                             This is implied if test environment does not exist, or whenever requirements in
+                             requirements.txt, pinned.txt, tox.ini deps, or the Python version changed since the
+                             environment was last updated. Changed requirements are installed incrementally
+                             when possible per config test.incremental_redevelop.
                              Use -ro to do redevelop only without running tests.
                              Use -rr to remove the test environment first before redevelop (recreate).
       :param bool install_only: Modifier for redevelop. Perform install only without running test.
+      :param bool parallel_envs: Run the commands of multiple envs at the same time, such as tests and style check,
+                                 and show their output separately followed by a combined summary.
+                                 Envs that need to be redeveloped are redeveloped and tested first.
+                                 Envs that share an envdir or write coverage data are run one after another.
       :param bool match_test: Only run tests with method name that matches pattern
       :param bool return_output: Return test output instead of printing to stdout
       :param str num_processes: Number of processes to use when running tests in parallel
@@ -77,9 +105,11 @@ class Test(AbstractCommand):
           cls.make_args('-d', '--show-dependencies', metavar='FILTER', action='store', nargs='?', help=docs['show_dependencies'],
                         const=True),
           cls.make_args('-t', '--test-dependents', action='store_true', help=docs['test_dependents']),
+          cls.make_args('--stop-early', action='store_true', help=docs['stop_early']),
           cls.make_args('-r', '--redevelop', action='count', help=docs['redevelop']),
           cls.make_args('-o', action='store_true', dest='install_only', help=argparse.SUPPRESS),
           cls.make_args('-e', '--install-editable', nargs='+', help=docs['install_editable']),
+          cls.make_args('-p', '--parallel-envs', action='store_true', help=docs['parallel_envs']),
         ]
 
     @classmethod
@@ -155,24 +185,35 @@ class Test(AbstractCommand):
         if self.test_dependents:
             name = product_name()
 
-            # Convert None to list for tuple([])
-            if not self.env_or_file:
-                self.env_or_file = []
-            if not self.extra_args:
-                self.extra_args = []
-
-            test_args = (
-              ('env_or_file', tuple(self.env_or_file)),
-              ('return_output', True),
-              ('num_processes', self.num_processes),
-              ('silent', True),
-              ('debug', self.debug),
-              ('extra_args', tuple(self.extra_args))
+            test_args = dict(
+              env_or_file=self.env_or_file,
+              return_output=True,
+              num_processes=self.num_processes,
+              silent=True,
+              debug=self.debug,
+              extra_args=self.extra_args
             )
 
+            workspace_dir = workspace_path()
+            graph = dependency_graph(workspace_dir)
+            durations_file = os.path.join(workspace_dir, TEST_DURATIONS_FILE)
+            durations = _read_json_file(durations_file)
+
             test_repos = [repo_path()]
-            test_repos.extend(r for r in repos(workspace_path()) if self.product_depends_on(r, name) and r not in test_repos)
-            test_args = [(r, test_args, self.__class__) for r in test_repos]
+            test_repos.extend(r for r in sorted(graph) if name in graph[r] and r not in test_repos)
+
+            names = dict((r, product_name(r)) for r in test_repos)
+            dependencies = dict((r, [d for d in test_repos if names[d] in graph.get(r, ())]) for r in test_repos)
+            test_repos = schedule(test_repos, dependencies, dict((r, durations.get(names[r], 0)) for r in test_repos))
+
+            def test_dependent(repo):
+                start = time.time()
+                result = test_repo(repo, test_class=self.__class__, **test_args)
+                durations[names[repo]] = round(time.time() - start, 1)
+                return result
+
+            def test_failed(result):
+                return not (isinstance(result, tuple) and self.summarize(result[1])[0])
 
             def test_done(result):
                 name, output = result
@@ -190,8 +231,8 @@ class Test(AbstractCommand):
                     log.error('%s: %s', name, '\n\t'.join([summary, temp_output_file]))
 
             def show_remaining(completed, all_args):
-                completed_repos = set(product_name(r) for r, _, _ in completed)
-                all_repos = set(product_name(r) for r, _, _ in all_args)
+                completed_repos = set(product_name(r) for r in completed)
+                all_repos = set(product_name(r) for r in all_args)
                 remaining_repos = sorted(list(all_repos - completed_repos))
                 if len(remaining_repos):
                     repo = remaining_repos.pop()
@@ -200,7 +241,16 @@ class Test(AbstractCommand):
                 else:
                     return 'None'
 
-            repo_results = parallel_call(test_repo, test_args, callback=test_done, show_progress=show_remaining, progress_title='Remaining')
+            repo_results = parallel_call(test_dependent, test_repos, callback=test_done, show_progress=show_remaining,
+                                         progress_title='Remaining', label=product_name,
+                                         dependencies=dependencies if self.stop_early else None,
+                                         failed=test_failed if self.stop_early else None)
+
+            _write_json_file(durations_file, durations)
+
+            for repo in test_repos:
+                if repo_results[repo] is None:
+                    log.error('%s: Skipped as a product it depends on failed', names[repo])
 
             for result in list(repo_results.values()):
                 if isinstance(result, tuple):
@@ -209,7 +259,7 @@ class Test(AbstractCommand):
                 if not (success or self.return_output):
                     sys.exit(1)
 
-            return dict(list(repo_results.values()))
+            return dict(r for r in repo_results.values() if isinstance(r, tuple))
 
         if not self.repo:
             self.repo = project_path()
@@ -307,10 +357,9 @@ class Test(AbstractCommand):
             for env in envs:
                 env_commands[env] = ' '.join(cmd)
 
-                # Touch envdir
-                envdir = tox.envdir(env)
-                if os.path.exists(envdir):
-                    os.utime(envdir, None)
+                if os.path.exists(tox.envdir(env)):
+                    write_requirements_fingerprint(tox, env)
+                    add_env(tox.envdir(env))
 
                 # Strip entry version
                 self._strip_version_from_entry_scripts(tox, env)
@@ -319,19 +368,17 @@ class Test(AbstractCommand):
                 return output
 
         else:
+            parallel_envs = []
+
             for env in envs:
                 envdir = tox.envdir(env)
 
-                def requirements_updated():
-                    req_mtime = 0
-                    requirements_files = ['requirements.txt', 'pinned.txt', 'tox.ini']
-                    for req_file in requirements_files:
-                        req_path = os.path.join(self.repo, req_file)
-                        if os.path.exists(req_path):
-                            req_mtime = max(req_mtime, os.stat(req_path).st_mtime)
-                    return req_mtime > os.stat(envdir).st_mtime
+                if os.path.exists(envdir):
+                    up_to_date = not requirements_changed(tox, env) or self._incremental_redevelop(tox, env)
+                else:
+                    up_to_date = self._develop_from_pool(tox, env)
 
-                if not os.path.exists(envdir) or requirements_updated():
+                if not up_to_date:
                     env_commands.update(
                         self.commander.run('test', env_or_file=[env], repo=self.repo, redevelop=True, tox_cmd=self.tox_cmd,
                                            tox_ini=self.tox_ini, tox_commands=self.tox_commands, match_test=self.match_test,
@@ -342,18 +389,15 @@ class Test(AbstractCommand):
                 commands = self.tox_commands.get(env) or tox.commands(env)
                 env_commands[env] = '\n'.join(commands)
 
+                if self.parallel_envs and len(envs) > 1:
+                    parallel_envs.append(env)
+                    continue
+
                 for command in commands:
-                    full_command = os.path.join(envdir, 'bin', command)
+                    full_command = self._env_command(tox, env, command, pytest_args)
 
-                    command_path = full_command.split()[0]
-                    if os.path.exists(command_path):
-                        if 'pytest' in full_command or 'py.test' in full_command:
-                            if 'PYTESTARGS' in full_command:
-                                full_command = full_command.replace('{env:PYTESTARGS:}', pytest_args)
-                            else:
-                                full_command += ' ' + pytest_args
-                        activate = '. ' + os.path.join(envdir, 'bin', 'activate')
-                        output = run(activate + '; ' + full_command, shell=True, cwd=self.repo, raises=False, silent=self.silent,
+                    if full_command:
+                        output = run(full_command, shell=True, cwd=self.repo, raises=False, silent=self.silent,
                                      return_output=self.return_output)
                         if not output:
                             if self.return_output:
@@ -367,14 +411,196 @@ class Test(AbstractCommand):
                         if self.return_output:
                             return output
                     else:
-                        log.error('%s does not exist', command_path)
                         if self.return_output:
                             return False
                         else:
                             sys.exit(1)
 
+            if parallel_envs:
+                success, output = self._run_envs_in_parallel(tox, parallel_envs, pytest_args)
+
+                if self.return_output:
+                    return output
+                elif not success:
+                    sys.exit(1)
+
         return env_commands
 
+    def _env_command(self, tox, env, command, pytest_args):
+        """ Returns the shell command to run the env command with the env activated, or None if it does not exist """
+        envdir = tox.envdir(env)
+        full_command = os.path.join(envdir, 'bin', command)
+
+        command_path = full_command.split()[0]
+        if not os.path.exists(command_path):
+            log.error('%s does not exist', command_path)
+            return None
+
+        if 'pytest' in full_command or 'py.test' in full_command:
+            if 'PYTESTARGS' in full_command:
+                full_command = full_command.replace('{env:PYTESTARGS:}', pytest_args)
+            else:
+                full_command += ' ' + pytest_args
+
+        return '. ' + os.path.join(envdir, 'bin', 'activate') + '; ' + full_command
+
+    def _run_envs_in_parallel(self, tox, envs, pytest_args):
+        """
+        Runs the commands of the envs at the same time with their output buffered separately. Each output is shown
+        when its env finishes (only failures when silent), followed by a combined summary from :meth:`summarize`.
+        Envs that are not independent per :func:`env_dependencies` are run one after another in the given order.
+
+        :return: Tuple of (success, output) where output is the combined output of all envs in the given order
+        """
+        env_commands = dict((env, self.tox_commands.get(env) or tox.commands(env)) for env in envs)
+
+        def run_env(env):
+            outputs = []
+
+            for command in env_commands[env]:
+                full_command = self._env_command(tox, env, command, pytest_args)
+                if not full_command:
+                    return env, False, '\n'.join(outputs)
+
+                output, success = run(full_command, shell=True, cwd=self.repo, return_output=2)
+                outputs.append(output)
+
+                if not success:
+                    return env, False, '\n'.join(outputs)
+
+            return env, True, '\n'.join(outputs)
+
+        def show_output(result):
+            env, success, output = result
+            if output.strip() and (not self.silent or not success):
+                click.secho('{}:'.format(env), bold=True)
+                click.echo(output.rstrip() + '\n')
+
+        results = parallel_call(run_env, envs, callback=show_output, workers=len(envs), show_progress=not self.silent,
+                                progress_title='Running', dependencies=env_dependencies(tox, envs, env_commands))
+        results = dict((env, results[env] if isinstance(results[env], tuple) else (env, False, str(results[env])))
+                       for env in envs)
+
+        # Envs without test output, such as style, are summarized by their success instead
+        env_tests = dict((env, output if not success or TEST_RE.search(output) or BUILD_RE.search(output) else True)
+                         for env, success, output in results.values())
+        success, summaries = self.summarize(env_tests)
+
+        if not self.silent or not success:
+            for summary in summaries:
+                click.echo(summary)
+
+        return success, '\n'.join(results[env][2] for env in envs)
+
+    def _incremental_redevelop(self, tox, env):
+        """
+        Install, upgrade, or remove only the requirements that changed since the env was last developed, based on
+        what is installed in the env.
+
+        :return: True if the env is up to date, or False if a full redevelop is needed as the changes can not be
+                 applied this way, such as when the Python version changed or a changed requirement is not a
+                 plain requirement spec (e.g. -r file or URL).
+        """
+        if not config.test.incremental_redevelop:
+            return False
+
+        old_inputs = _read_fingerprints(tox.envdir(env)).get(env, {}).get('inputs')
+        diff = old_inputs and requirements_diff(old_inputs, requirements_inputs(tox, env))
+        if not diff:
+            return False
+
+        changed, removed = diff
+        pip = tox.bindir(env, 'pip')
+
+        output, success = run([pip, 'list', '--format=json', '--disable-pip-version-check'], return_output=2)
+        try:
+            installed = dict((pkg_resources.safe_name(p['name']).lower(), p['version'])
+                             for p in json.loads(output.strip().split('\n')[0]))
+
+        except Exception:
+            log.debug('Could not get installed packages for %s env: %s', env, output)
+            return False
+
+        install = []
+        for key, reqs in sorted(changed.items()):
+            if key not in installed or not all(installed[key] in req for req in reqs):
+                install.extend(str(req) for req in reqs)
+
+        uninstall = sorted(key for key in removed if key in installed)
+        if uninstall:
+            # Keep packages that are still required by other packages (e.g. the product itself)
+            output = run([pip, 'show'] + uninstall, return_output=True)
+            required_by = dict((self._pip_show_field(info, 'Name').lower(), self._pip_show_field(info, 'Required-by'))
+                               for info in output.split('\n---\n'))
+            uninstall = [key for key in uninstall if not required_by.get(key)]
+
+        if install:
+            if not self.silent or self.debug:
+                click.echo('{}: Installing {}'.format(env, ' '.join(install)))
+
+            if not run(tox.install_command(env, install), cwd=self.repo, raises=False, silent=2 if self.silent else None):
+                log.debug('Incremental install failed for %s env, so falling back to full redevelop', env)
+                return False
+
+        if uninstall:
+            if not self.silent or self.debug:
+                click.echo('{}: Removing {}'.format(env, ' '.join(uninstall)))
+
+            run([pip, 'uninstall', '-y'] + uninstall, raises=False, silent=not self.debug)
+
+        write_requirements_fingerprint(tox, env)
+        add_env(tox.envdir(env))
+
+        return True
+
+    def _develop_from_pool(self, tox, env):
+        """
+        Develop a new env by cloning the closest env in the env pool, and then installing the deps and product on top.
+
+        :return: True if the env was developed, or False if a full redevelop is needed, such as when the pool does not
+                 have any env with the same Python version and some of the requirements.
+        """
+        python_path = shutil.which(tox.basepython(env))
+        if not python_path:
+            return False
+
+        inputs = requirements_inputs(tox, env)
+        req_lines = [line for name, lines in inputs.items() if name != 'python' for line in lines]
+        requirements = set(req.key for req in _parse_requirements(req_lines))
+        pooled_env = closest_env(inputs['python'], requirements)
+        envdir = tox.envdir(env)
+
+        if not pooled_env or not clone_env(pooled_env, envdir, python_path):
+            return False
+
+        if not self.silent or self.debug:
+            click.echo('{}: Cloned test environment from {}'.format(env, pooled_env))
+
+        packages = [arg for dep in _normalize_requirements(tox.deps(env)) for arg in shlex.split(tox.expand_vars(dep))]
+        if tox.usedevelop(env):
+            packages.extend(['-e', tox.path])
+        elif not tox.skipsdist(env):
+            packages.append(tox.path)
+
+        if packages and not run(tox.install_command(env, packages), cwd=self.repo, raises=False,
+                                silent=2 if self.silent else None):
+            log.debug('Install failed for %s env cloned from pool, so falling back to full redevelop', env)
+            shutil.rmtree(envdir, ignore_errors=True)
+            return False
+
+        self._strip_version_from_entry_scripts(tox, env)
+        write_requirements_fingerprint(tox, env)
+        add_env(envdir)
+
+        return True
+
+    @staticmethod
+    def _pip_show_field(info, field):
+        for line in info.split('\n'):
+            if line.startswith(field + ':'):
+                return line.split(':', 1)[1].strip()
+        return ''
+
     def _strip_version_from_entry_scripts(self, tox, env):
         """ Strip out version spec "==1.2.3" from entry scripts as they require re-develop when version is changed in develop mode. """
         name = product_name(tox.path)
@@ -520,25 +746,268 @@ else:
                     lib_path = os.path.join(lib_path, lib)
                 run([pip, 'install', '--editable', lib_path], silent=not self.debug)
 
-    def product_depends_on(self, path, name):
+
+def dependency_graph(workspace_dir):
+    """
+    Returns a dict of repo path to the set of project names that it requires per its requirement files (config
+    bump.requirement_files) for all repos in the workspace.
+
+    Requirements are cached in :data:`DEPENDENCY_GRAPH_FILE` under the workspace, and are only re-read for repos with
+    requirement files that changed since.
+    """
+    cache_file = os.path.join(workspace_dir, DEPENDENCY_GRAPH_FILE)
+    cache = _read_json_file(cache_file)
+    new_cache = {}
+
+    for repo in repos(workspace_dir):
+        stats = []
         for req_file in config.bump.requirement_files.split():
-            req_path = os.path.join(path, req_file)
+            req_path = os.path.join(repo, req_file)
             if os.path.exists(req_path):
-                with open(req_path) as fp:
-                    try:
-                        reqs = pkg_resources.parse_requirements(fp.read())
-                        if name in [r.project_name for r in reqs]:
-                            return True
-                    except Exception:
-                        pass
+                stat = os.stat(req_path)
+                stats.append([req_file, stat.st_mtime, stat.st_size])
+
+        if repo in cache and cache[repo]['stats'] == stats:
+            new_cache[repo] = cache[repo]
+            continue
+
+        requirements = set()
+        for req_file, _, _ in stats:
+            with open(os.path.join(repo, req_file)) as fp:
+                try:
+                    requirements.update(r.project_name for r in pkg_resources.parse_requirements(fp.read()))
+                except Exception as e:
+                    log.debug('Could not parse %s in %s: %s', req_file, repo, e)
+
+        new_cache[repo] = {'stats': stats, 'requirements': sorted(requirements)}
+
+    if new_cache != cache:
+        _write_json_file(cache_file, new_cache)
+
+    return dict((repo, set(info['requirements'])) for repo, info in new_cache.items())
+
+
+def schedule(repos, dependencies, durations):
+    """
+    Returns the repos in topological order, where repos that do not depend on each other are ordered by the longest
+    duration first, so they finish the soonest when run in parallel.
+
+    :param list repos: Repos to order
+    :param dict dependencies: Map of repo to list of repos that it depends on
+    :param dict durations: Map of repo to how long it took to test last time
+    """
+    ordered = []
+    remaining = list(repos)
+
+    while remaining:
+        ready = [r for r in remaining if all(d in ordered for d in dependencies.get(r, []) if d != r)]
+        if not ready:
+            log.debug('Found dependency cycle among %s', ', '.join(remaining))
+            ready = remaining
+
+        ready.sort(key=lambda r: durations.get(r, 0), reverse=True)
+        ordered.extend(ready)
+        remaining = [r for r in remaining if r not in ready]
+
+    return ordered
+
+
+def env_dependencies(tox, envs, env_commands):
+    """
+    Returns a map of env to the envs before it that it can not run at the same time with, as they share the same
+    envdir or both write coverage data into the repo.
+
+    :param list envs: Envs in the order to run them
+    :param dict env_commands: Map of env to list of its commands
+    """
+    dependencies = {}
+    env_outputs = {}
+
+    for env in envs:
+        outputs = {os.path.realpath(tox.envdir(env))}
+        if any(COVERAGE_RE.search(command) for command in env_commands[env]):
+            outputs.add('coverage')
+
+        dependencies[env] = [e for e in envs[:envs.index(env)] if env_outputs[e] & outputs]
+        env_outputs[env] = outputs
+
+    return dependencies
+
+
+def requirements_inputs(tox, env):
+    """
+    Returns a dict of the normalized inputs that determine what is installed in the env: the requirements files, the
+    deps in tox.ini, and the Python version. Comments, blank lines, and whitespace are ignored.
+    """
+    inputs = {}
+
+    for req_file in REQUIREMENTS_FILES:
+        req_path = os.path.join(tox.path, req_file)
+        if os.path.exists(req_path):
+            with open(req_path) as fp:
+                inputs[req_file] = _normalize_requirements(fp.read().split('\n'))
+
+    inputs['deps'] = _normalize_requirements(tox.deps(env))
+
+    inputs['python'] = _python_version(tox.basepython(env))
+
+    return inputs
+
+
+def requirements_fingerprint(inputs):
+    """ Returns the fingerprint (hash) of the inputs from :func:`requirements_inputs` """
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def requirements_changed(tox, env):
+    """
+    Checks if the requirements for the env have changed since it was last developed, based on the fingerprint in
+    the envdir. Envs developed before fingerprints were recorded fall back to comparing mtimes of the requirements
+    files with the envdir, and get a fingerprint if they are up to date.
+    """
+    envdir = tox.envdir(env)
+    fingerprints = _read_fingerprints(envdir)
+
+    if env not in fingerprints:
+        req_mtime = 0
+        for req_file in REQUIREMENTS_FILES + ['tox.ini']:
+            req_path = os.path.join(tox.path, req_file)
+            if os.path.exists(req_path):
+                req_mtime = max(req_mtime, os.stat(req_path).st_mtime)
+
+        if req_mtime > os.stat(envdir).st_mtime:
+            return True
+
+        write_requirements_fingerprint(tox, env)
         return False
 
+    inputs = requirements_inputs(tox, env)
+
+    if requirements_fingerprint(inputs) == fingerprints[env]['fingerprint']:
+        return False
+
+    changed = sorted(k for k in set(inputs) | set(fingerprints[env]['inputs'])
+                     if inputs.get(k) != fingerprints[env]['inputs'].get(k))
+    log.debug('Requirements changed for %s env: %s', env, ', '.join(changed))
+
+    return True
+
+
+def requirements_diff(old_inputs, new_inputs):
+    """
+    Returns the requirement changes between the inputs from :func:`requirements_inputs`.
+
+    :return: Tuple of (changed, removed) where changed is a dict of project key to list of
+             :class:`pkg_resources.Requirement` for projects that are new or have changed requirements, and removed is
+             a set of project keys that are no longer required. None if the changes can not be applied incrementally,
+             such as when the Python version changed or a changed line is not a requirement spec (e.g. -r file).
+    """
+    if old_inputs.get('python') != new_inputs.get('python'):
+        return None
+
+    def requirement_lines(inputs):
+        return set(line for name, lines in inputs.items() if name != 'python' for line in lines)
+
+    old_lines = requirement_lines(old_inputs)
+    new_lines = requirement_lines(new_inputs)
+
+    # Lines that are not requirement specs (e.g. -r file) can not be applied incrementally unless they are unchanged
+    if any(_parse_requirement(line) is None for line in old_lines ^ new_lines):
+        return None
+
+    def requirements_by_key(lines):
+        requirements = {}
+        for req in _parse_requirements(lines):
+            requirements.setdefault(req.key, set()).add(req)
+        return requirements
+
+    old_reqs = requirements_by_key(old_lines)
+    new_reqs = requirements_by_key(new_lines)
+
+    changed = dict((key, sorted(reqs, key=str)) for key, reqs in new_reqs.items() if reqs != old_reqs.get(key))
+    removed = set(old_reqs) - set(new_reqs)
+
+    return changed, removed
+
+
+def write_requirements_fingerprint(tox, env):
+    """ Record the fingerprint of the current requirements for the env in its envdir """
+    envdir = tox.envdir(env)
+    inputs = requirements_inputs(tox, env)
+
+    fingerprints = _read_fingerprints(envdir)
+    fingerprints[env] = {'fingerprint': requirements_fingerprint(inputs), 'inputs': inputs}
+
+    with open(os.path.join(envdir, FINGERPRINT_FILE), 'w') as fp:
+        json.dump(fingerprints, fp, indent=2, sort_keys=True)
+
+
+def _read_fingerprints(envdir):
+    try:
+        with open(os.path.join(envdir, FINGERPRINT_FILE)) as fp:
+            return json.load(fp)
+
+    except Exception:
+        return {}
+
+
+def _parse_requirement(line):
+    """ Returns the :class:`pkg_resources.Requirement` for the line, or None if it is not a requirement spec """
+    try:
+        return pkg_resources.Requirement.parse(line)
+    except Exception:
+        return None
+
+
+def _parse_requirements(lines):
+    """ Yields :class:`pkg_resources.Requirement` for the lines that are requirement specs """
+    for line in lines:
+        req = _parse_requirement(line)
+        if req:
+            yield req
+
+
+def _read_json_file(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+
+    except Exception:
+        return {}
+
+
+def _write_json_file(path, data):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path, 'w') as fp:
+        json.dump(data, fp)
+
+
+def _normalize_requirements(lines):
+    return [' '.join(line.split()) for line in (COMMENT_RE.sub('', l) for l in lines) if line.strip()]
+
+
+_python_versions = {}
+
+
+def _python_version(python):
+    """ Returns the version of the python executable (name or path), or None if it is not found """
+    python_path = shutil.which(python)
+
+    if python_path and python_path not in _python_versions:
+        version = run([python_path, '-c', 'import platform; print(platform.python_version())'], return_output=True,
+                      raises=False, silent=True)
+        _python_versions[python_path] = version.strip() if version else None
+
+    return _python_versions.get(python_path)
+
 
-def test_repo(repo, test_args, test_class):
+def test_repo(repo, test_class=Test, **test_args):
     name = product_name(repo)
 
     branch = current_branch(repo)
     on_branch = '#' + branch if branch != 'master' and branch is not None else ''
     click.echo('Testing {} {}'.format(name, on_branch))
 
-    return name, test_class(repo=repo, **dict(test_args)).run()
+    return name, test_class(repo=repo, **test_args).run()
@@ -1,25 +1,34 @@
 from __future__ import absolute_import
+from contextlib import ExitStack
 import logging
+import os
+import random
 import sys
+from time import sleep, time
 
 import click
 
 from workspace.commands import AbstractCommand
 from workspace.commands.helpers import expand_product_groups
+from workspace.config import config
 from workspace.scm import checkout_branch, update_repo, repos, product_name, current_branch,\
-    update_branch, parent_branch
-from workspace.utils import parallel_call
+    update_branch, parent_branch, is_up_to_date, remote_host, repo_state, UpdateError
+from workspace.utils import AdaptiveLimit, parallel_call
 
 log = logging.getLogger(__name__)
 
+#: Result of :func:`_update_repo` when the update was skipped as the repo is up to date
+SKIPPED = 'skipped'
+
 
 class Update(AbstractCommand):
     """
     Update current product or all products in workspace
 
     :param list products: When updating all products, filter by these products or product groups
+    :param bool skip_unchanged: Check remotes for changes first (using git ls-remote, which is much faster than a pull)
+                                and skip products that are already up to date.
     """
-    alias = 'up'
 
     def __init__(self, *args, **kwargs):
         kwargs.setdefault('raises', True)
@@ -28,7 +37,10 @@ class Update(AbstractCommand):
     @classmethod
     def arguments(cls):
         _, docs = cls.docs()
-        return [cls.make_args('products', nargs='*', help=docs['products'])]
+        return [
+          cls.make_args('products', nargs='*', help=docs['products']),
+          cls.make_args('-s', '--skip-unchanged', action='store_true', help=docs['skip_unchanged'])
+        ]
 
     def run(self):
 
@@ -42,22 +54,126 @@ class Update(AbstractCommand):
             click.echo('No product found')
 
         elif len(select_repos) == 1:
-            _update_repo(select_repos[0], raises=self.raises, verbose=0 if self.quiet else 2)
+            result = _update_repo(select_repos[0], raises=self.raises, verbose=0 if self.quiet else 2,
+                                  skip_unchanged=self.skip_unchanged)
+            if result == SKIPPED and not self.quiet:
+                click.echo('Already up to date')
 
         else:
-            if not all(parallel_call(_update_repo, select_repos).values()):
+            durations = {}
+            host_limits = {}
+            workers = config.update.max_workers or 4 * (os.cpu_count() or 1)
+
+            def update(repo):
+                start = time()
+                result = self._update_with_retries(repo, host_limits)
+                durations[repo] = time() - start
+                return result
+
+            def show_completed(completed, all_repos):
+                return '{}/{} completed'.format(len(completed), len(all_repos))
+
+            results = parallel_call(update, select_repos, workers=min(workers, len(select_repos)),
+                                    show_progress=not self.quiet and show_completed, progress_title='Update',
+                                    label=product_name)
+
+            if self.skip_unchanged:
+                self._show_skipped(results, durations)
+
+            if not all(results.values()):
                 sys.exit(1)
 
+    def _update_with_retries(self, repo, host_limits):
+        """
+        Update the repo while limiting concurrent updates per git host of its remotes, and retry transient failures.
+
+        :param dict host_limits: Map of git host to its :class:`AdaptiveLimit`, shared by all updates.
+        :return: Same as :func:`_update_repo`
+        """
+        hosts = sorted(set(remote_host(url) for url in repo_state(repo).remote_urls.values()))
+        limits = [host_limits.setdefault(host, AdaptiveLimit(config.update.max_connections_per_host)) for host in hosts]
+        retries = config.update.retries or 0
+
+        # Resolved once as a failed attempt may leave the parent branch checked out
+        branch = current_branch(repo)
+
+        for attempt in range(retries + 1):
+            error = None
+
+            # Limits are acquired in host order so updates with overlapping hosts do not deadlock.
+            with ExitStack() as stack:
+                for limit in limits:
+                    stack.enter_context(limit)
+
+                try:
+                    result = _update_repo(repo, raises=True, skip_unchanged=self.skip_unchanged, branch=branch)
+
+                except UpdateError as e:
+                    error = e
+                    if e.is_transient():
+                        for limit in limits:
+                            limit.failed()
+
+                except Exception as e:
+                    error = e
+
+                else:
+                    for limit in limits:
+                        limit.succeeded()
+                    return result
 
-def _update_repo(repo, raises=False, verbose=1):
+            if attempt < retries and isinstance(error, UpdateError) and error.is_transient():
+                delay = 2 ** attempt * random.uniform(0.5, 1.5)
+                log.debug('Retrying update for %s in %.1fs due to: %s', product_name(repo), delay, error)
+                sleep(delay)
+            else:
+                break
+
+        log.error('%s: %s', product_name(repo), error)
+        return False
+
+    def _show_skipped(self, results, durations):
+        """ Show how many repos were skipped and an estimate of how much update time was saved """
+        skipped = [repo for repo, result in results.items() if result == SKIPPED]
+        if not skipped:
+            return
+
+        message = 'Skipped {} of {} products as they are up to date'.format(len(skipped), len(results))
+        updated_durations = [durations[repo] for repo, result in results.items() if result is True and repo in durations]
+
+        if updated_durations:
+            # Skipped repos would have taken about as long as the average update, minus the time spent checking them.
+            saved = (len(skipped) * sum(updated_durations) / len(updated_durations) -
+                     sum(durations.get(repo, 0) for repo in skipped))
+            if saved > 0:
+                message += ', saving about {:.1f}s of update time'.format(saved)
+
+        click.echo(message)
+
+
+def _update_repo(repo, raises=False, verbose=1, skip_unchanged=False, branch=None):
+    """
+    Update the repo and rebase the current branch if it is a child branch.
+
+    :param bool skip_unchanged: Skip update if the repo is up to date per :func:`is_up_to_date`. Child branches are
+                                always updated as they may need to be rebased.
+    :param str branch: Branch to update. Defaults to the current branch.
+    :return: True if updated, :data:`SKIPPED` if skipped, or False on failure
+    """
     name = product_name(repo)
+    parent = None
 
     try:
+        branch = branch or current_branch(repo)
+        parent = parent_branch(branch) if branch else None
+
+        if skip_unchanged and not parent and is_up_to_date(repo):
+            log.debug('Skipping update for %s as it is up to date', name)
+            return SKIPPED
+
         if verbose == 1:
             click.echo('Updating ' + name)
 
-        branch = current_branch(repo)
-        parent = parent_branch(branch)
         if parent:
             checkout_branch(parent, repo)
 
@@ -71,6 +187,12 @@ def _update_repo(repo, raises=False, verbose=1):
 
         return True
     except Exception as e:
+        if parent and current_branch(repo) == parent:  # Failed before rebasing, so go back to the child branch
+            try:
+                checkout_branch(branch, repo_path=repo)
+            except Exception as checkout_error:
+                log.debug('Could not checkout %s after failed update: %s', branch, checkout_error)
+
         if raises:
             raise
         else:
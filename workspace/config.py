@@ -31,6 +31,9 @@
   # It should accept a ?q=singleWord param
   search_api_url = https://api.github.com/search/repositories
 
+  # Number of days to cache repo URLs found using the search API. Set to 0 to turn off.
+  search_cache_days = 7
+
   # URL to use when checking out a user repo reference (e.g. wst checkout maxzheng/workspace-tools)
   user_repo_url = git@github.com:%s.git
 
@@ -38,6 +41,13 @@
   # will use upstream remote. e.g. maxzheng
   origin_user =
 
+  # Directory to cache bare mirrors of checked out repos in. Mirrors are used as reference for faster clones of
+  # the same repos later, such as in another workspace or after wst clean. Leave empty to turn off.
+  reference_cache_dir = ~/.cache/workspace
+
+  # Max size of the reference cache in MB. Least recently used mirrors are removed when it is exceeded.
+  reference_cache_size_mb = 5120
+
   ###########################################################################################################
   # Settings for clean command
   ###########################################################################################################
@@ -69,6 +79,51 @@
 
   # Branches to merge separated by space (e.g. 3.2.x 3.3.x master)
   branches =
+
+
+  ###########################################################################################################
+  # Settings for publish command
+  ###########################################################################################################
+  [publish]
+
+  # Max number of commits since the last publish to add to the changelog, such as when publishing for the first time
+  max_changes = 100
+
+
+  ###########################################################################################################
+  # Settings for test command
+  ###########################################################################################################
+  [test]
+
+  # When requirements change, only install / upgrade / remove the changed ones in the test environment instead
+  # of redeveloping it with tox. Falls back to tox when the changes can not be applied that way.
+  incremental_redevelop = True
+
+  # Directory to pool test environments in, keyed by their Python version and installed packages, so that products
+  # with the same dependencies share them. New test environments are cloned from the closest pooled one using
+  # hardlinks, and only the rest is installed on top. As files are shared, anything that changes an installed file
+  # in place (instead of replacing it like pip does) changes it in all of them, so it is off by default. Set it to
+  # turn on, e.g. ~/.cache/workspace/envs
+  env_pool_dir =
+
+  # Max number of test environments to keep in the pool. Least recently used ones are removed when it is exceeded.
+  env_pool_size = 20
+
+
+  ###########################################################################################################
+  # Settings for update command
+  ###########################################################################################################
+  [update]
+
+  # Max number of products to update concurrently. Defaults to 4 per CPU when empty.
+  max_workers =
+
+  # Max number of products to update concurrently from the same git host. The actual number backs off when
+  # updates from the host fail with transient errors, and grows again after successes, up to this limit.
+  max_connections_per_host = 8
+
+  # Number of times to retry updates that failed due to transient network errors, with exponential backoff.
+  retries = 2
 """
 from __future__ import absolute_import
 
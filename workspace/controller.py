@@ -1,28 +1,36 @@
 from __future__ import absolute_import
 import argparse
+from importlib import import_module
 import logging
-import pkg_resources
+import os
 import sys
 import textwrap
 
-from workspace.commands.bump import Bump
-from workspace.commands.checkout import Checkout
-from workspace.commands.clean import Clean
-from workspace.commands.commit import Commit
-from workspace.commands.diff import Diff
-from workspace.commands.log import Log
-from workspace.commands.merge import Merge
-from workspace.commands.publish import Publish
-from workspace.commands.push import Push
-from workspace.commands.update import Update
-from workspace.commands.status import Status
-from workspace.commands.setup import Setup
-from workspace.commands.test import Test
-from workspace.utils import log_exception
+import workspace.utils
+from workspace.utils import invalidate_parent_paths, log_exception
 
 
 log = logging.getLogger(__name__)
 
+#: Map of command name to its class path and alias (aliases are only defined here). Command modules are only imported
+#: when the command is used, as they import dependencies that are slow to load (bumper, requests, etc), which adds up
+#: for frequently used commands.
+COMMANDS = {
+    'bump': ('workspace.commands.bump:Bump', None),
+    'checkout': ('workspace.commands.checkout:Checkout', 'co'),
+    'clean': ('workspace.commands.clean:Clean', None),
+    'commit': ('workspace.commands.commit:Commit', 'ci'),
+    'diff': ('workspace.commands.diff:Diff', 'di'),
+    'log': ('workspace.commands.log:Log', None),
+    'merge': ('workspace.commands.merge:Merge', None),
+    'publish': ('workspace.commands.publish:Publish', None),
+    'push': ('workspace.commands.push:Push', None),
+    'setup': ('workspace.commands.setup:Setup', None),
+    'status': ('workspace.commands.status:Status', 'st'),
+    'test': ('workspace.commands.test:Test', None),
+    'update': ('workspace.commands.update:Update', 'up'),
+}
+
 
 class Commander(object):
     """
@@ -39,20 +47,42 @@ class Commander(object):
       * All commands are named appropriately for what they do, but see its --help for additional info.
       * For more info, read the docs at http://workspace-tools.readthedocs.org
     """
+    #: Global options that take a value, so the value is not mistaken for the command name.
+    GLOBAL_OPTIONS_WITH_VALUE = ['--progress-file', '--trace']
 
     @classmethod
     def commands(cls):
         """
-          Map of command name to command classes.
+          Map of command name to command classes, or their class paths (e.g. "workspace.commands.log:Log") to import
+          them only when used.
           Override commands to replace any command name with another class to customize the command.
         """
-        cs = [Bump, Checkout, Clean, Commit, Diff, Log, Merge, Publish, Push, Setup, Status, Test, Update]
-        return dict((c.name(), c) for c in cs)
+        return dict((name, path) for name, (path, _) in COMMANDS.items())
+
+    @classmethod
+    def aliases(cls):
+        """ Map of command alias to command name """
+        aliases = {}
+
+        for name, command in cls.commands().items():
+            # Custom command classes may set their own alias, otherwise the alias of the command name is used.
+            alias = getattr(command, 'alias', None) or COMMANDS.get(name, (None, None))[1]
+
+            if alias:
+                aliases[alias] = name
+
+        return aliases
 
     @classmethod
     def command(cls, name):
-        """ Get command class for name """
-        return cls.commands().get(name)
+        """ Get command class for name. The command module is imported if needed. """
+        command = cls.commands().get(name)
+
+        if isinstance(command, str):
+            module, class_name = command.split(':')
+            command = getattr(import_module(module), class_name)
+
+        return command
 
     @classmethod
     def main(cls):
@@ -64,7 +94,9 @@ class Commander(object):
           Sets up logging, parser, and creates the necessary command sequences to run, and runs
           the command given by the user.
         """
-        self.setup_parsers()
+        # Only setup the parser for the command being run, so other command modules do not need to be imported.
+        name = self._command_name(sys.argv[1:])
+        self.setup_parsers(names=name and [name])
 
         args, extra_args = self.parser.parse_known_args()
 
@@ -72,17 +104,40 @@ class Commander(object):
             self.parser.print_help()
             sys.exit()
 
-        if args.command not in [c.name() for c in list(self.commands().values()) if 'extra_args' in c.docs()[1]] and extra_args:
+        if 'extra_args' not in self.command(self.aliases().get(args.command, args.command)).docs()[1] and extra_args:
             log.error('Unrecognized arguments: %s', ' '.join(extra_args))
             sys.exit(1)
 
         if args.debug:
             logging.root.setLevel(logging.DEBUG)
 
-        with log_exception(exit=True, stack=args.debug):
-            args_dict = args.__dict__
-            args_dict['extra_args'] = extra_args
-            return self.run(args.command, **args_dict)
+        workspace.utils.progress_file = args.progress_file or os.environ.get('WST_PROGRESS_FILE')
+
+        # Imported here as scm is not needed to parse args, such as for --help
+        from workspace.scm import invalidate_repo_state, git_query_stats
+
+        # Repo state snapshots and parent paths are shared for the lifetime of the command, but anything may have
+        # changed before it.
+        invalidate_repo_state(all=True)
+        invalidate_parent_paths()
+
+        tracer = None
+        if args.profile or args.trace:
+            from workspace.tracer import Tracer
+            tracer = Tracer(' '.join(['wst'] + sys.argv[1:])).start()
+
+        try:
+            with log_exception(exit=True, stack=args.debug):
+                args_dict = args.__dict__
+                args_dict['extra_args'] = extra_args
+                return self.run(args.command, **args_dict)
+
+        finally:
+            log.debug('Git query cache: %d hits, %d misses', git_query_stats['hits'], git_query_stats['misses'])
+
+            if tracer:
+                tracer.stop()
+                tracer.report(args.trace)
 
     def run(self, name=None, **kwargs):
         """
@@ -94,6 +149,8 @@ class Commander(object):
         if not name:
             return self._run()
 
+        name = self.aliases().get(name, name)
+
         if name in self.commands():
             kwargs['commander'] = self
             return self.command(name)(**kwargs).run()
@@ -111,19 +168,54 @@ class Commander(object):
                                               formatter_class=argparse.RawDescriptionHelpFormatter)
         self.parser.register('action', 'parsers', AliasedSubParsersAction)
 
+        self.parser.add_argument('-v', '--version', action=_LazyVersionAction, version=self._versions)
+        self.parser.add_argument('--debug', action='store_true', help='Turn on debug mode')
+        self.parser.add_argument('--progress-file', metavar='FILE',
+                                 help='Write start / finish events with durations for each product of multi-product '
+                                      'commands to the file as JSON lines. Use "-" for stderr.')
+        self.parser.add_argument('--profile', action='store_true',
+                                 help='Show how long the command took, how much of it was spent waiting on subprocesses '
+                                      '(git, tox, etc) vs in Python, and the slowest subprocesses.')
+        self.parser.add_argument('--trace', metavar='FILE',
+                                 help='Same as --profile, and also write all subprocesses and the time spent in Python '
+                                      'between them to the file in Chrome trace format (for chrome://tracing, '
+                                      'ui.perfetto.dev, or speedscope.app).')
+
+    def _versions(self):
+        """ Versions of workspace-tools and the customized package. Only looked up when --version is used. """
+        try:
+            from importlib.metadata import version
+        except ImportError:  # Python < 3.8
+            import pkg_resources
+
+            def version(pkg):
+                return pkg_resources.get_distribution(pkg).version
+
         versions = []
         for pkg in [_f for _f in [getattr(self, 'package_name', None), 'workspace-tools'] if _f]:
             try:
-                versions.append('%s %s' % (pkg, pkg_resources.get_distribution(pkg).version))
+                versions.append('%s %s' % (pkg, version(pkg)))
             except Exception:
                 pass
 
-        self.parser.add_argument('-v', '--version', action='version', version='\n'.join(versions))
-        self.parser.add_argument('--debug', action='store_true', help='Turn on debug mode')
+        return '\n'.join(versions)
+
+    def _command_name(self, argv):
+        """ Returns the name of the command in the given CLI args, or None if there isn't a valid one. """
+        argv = iter(argv)
 
-    def setup_parsers(self):
+        for arg in argv:
+            if arg in self.GLOBAL_OPTIONS_WITH_VALUE:
+                next(argv, None)
+            elif not arg.startswith('-'):
+                name = self.aliases().get(arg, arg)
+                return name if name in self.commands() else None
+
+    def setup_parsers(self, names=None):
         """
           Sets up parsers for all commands
+
+          :param list names: Only setup parsers for these command names.
         """
 
         self._setup_parser()
@@ -131,10 +223,13 @@ class Commander(object):
         self.subparsers = self.parser.add_subparsers(title='sub-commands', help='List of sub-commands', dest='command')
         self.subparsers.remove_parser = lambda *args, **kwargs: _remove_parser(self.subparsers, *args, **kwargs)
 
-        for name, command in sorted(self.commands().items()):
+        command_aliases = dict((name, alias) for alias, name in self.aliases().items())
+
+        for name in sorted(names or self.commands()):
+            command = self.command(name)
             doc, _ = command.docs()
             help = list(filter(None, doc.split('\n')))[0]
-            aliases = [command.alias] if command.alias else None
+            aliases = [command_aliases[name]] if name in command_aliases else None
 
             parser = self.subparsers.add_parser(name, aliases=aliases, description=textwrap.dedent(doc), help=help,
                                                 formatter_class=argparse.RawDescriptionHelpFormatter)
@@ -156,6 +251,15 @@ class Commander(object):
                     group.add_argument(*args, **kwargs)
 
 
+class _LazyVersionAction(argparse._VersionAction):
+    """ Version action that accepts a callable for version so it is only computed when used. """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if callable(self.version):
+            self.version = self.version()
+        super(_LazyVersionAction, self).__call__(parser, namespace, values, option_string)
+
+
 # Copied from https://gist.github.com/sampsyo/471779
 class AliasedSubParsersAction(argparse._SubParsersAction):
 
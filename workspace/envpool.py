@@ -0,0 +1,283 @@
+"""
+Pool of test environments shared across products, which new test environments are cloned from.
+
+Each pooled env is keyed by a hash of its Python version and installed packages (excluding packages installed in
+develop mode, such as the product itself), so products with the same dependency closure share one pooled env. New
+envs are cloned from the pooled env that is closest to their requirements by hardlinking its site-packages, which
+takes little time and disk space, and then only the rest needs to be installed on top.
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import threading
+
+from utils.process import run
+
+from workspace.config import config
+
+log = logging.getLogger(__name__)
+
+#: File in each pooled env with its Python version, packages, and the envdir it was pooled from
+POOL_INFO_FILE = 'pool.json'
+
+#: Script that prints the Python version and site-packages dir of an env
+PYTHON_INFO_SCRIPT = """
+import json, platform, sysconfig
+print(json.dumps({'python': platform.python_version(), 'site_packages': sysconfig.get_paths()['purelib']}))
+"""
+
+EDITABLE_FILE_RE = re.compile(r'^(?:__editable__.*|.*\.egg-link|easy-install\.pth)$')
+DIST_INFO_RE = re.compile(r'^(.+?)-[^-]+\.(?:dist-info|egg-info)$')
+
+
+def env_pool_dir():
+    """ Returns the directory of the env pool, or None if it is turned off """
+    return config.test.env_pool_dir and os.path.expanduser(config.test.env_pool_dir)
+
+
+def canonical_name(name):
+    """ Normalized name of the package like pip does, e.g. Foo_Bar => foo-bar """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def env_info(envdir):
+    """
+    Returns a dict with python (version), site_packages (path), packages (dict of name to version), and editable (list of
+    names) for the env, or None if it can not be inspected, such as when it does not have pip.
+    """
+    python = os.path.join(envdir, 'bin', 'python')
+    pip_list = [python, '-m', 'pip', 'list', '--format=json', '--disable-pip-version-check']
+
+    try:
+        info = _json_output([python, '-c', PYTHON_INFO_SCRIPT])
+        info['packages'] = dict((canonical_name(p['name']), p['version'])
+                                for p in _json_output(pip_list + ['--exclude-editable']))
+        info['editable'] = [canonical_name(p['name']) for p in _json_output(pip_list + ['--editable'])]
+        return info
+
+    except Exception as e:
+        log.debug('Could not get packages installed in %s: %s', envdir, e)
+        return None
+
+
+def add_env(envdir):
+    """
+    Adds the env to the pool, unless there is already a pooled env with the same packages.
+
+    :param str envdir: Path to the env to add
+    :return: Path to the pooled env, or None if the pool is turned off or the env could not be added.
+    """
+    pool_dir = env_pool_dir()
+    info = pool_dir and env_info(envdir)
+    if not info or not info['packages']:
+        return None
+
+    key = json.dumps([info['python'], sorted(info['packages'].items())])
+    pooled_env = os.path.join(pool_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+
+    if os.path.exists(pooled_env):
+        os.utime(pooled_env, None)  # Used to find least recently used envs to remove
+        return pooled_env
+
+    editable = set(info['editable'])
+
+    def exclude(name):
+        match = DIST_INFO_RE.match(name)
+        return EDITABLE_FILE_RE.match(name) or (match and canonical_name(match.group(1)) in editable)
+
+    # Built in a temp path so that a partial env is never used, such as from CTRL+C or concurrent tests.
+    temp_path = '{}.{}.{}.tmp'.format(pooled_env, os.getpid(), threading.get_ident())
+
+    try:
+        _link_tree(info['site_packages'], os.path.join(temp_path, 'site-packages'), exclude=exclude)
+
+        os.makedirs(os.path.join(temp_path, 'bin'))
+        for script in _scripts(info['site_packages'], exclude=exclude):
+            shutil.copy2(os.path.join(envdir, 'bin', script), os.path.join(temp_path, 'bin', script))
+
+        with open(os.path.join(temp_path, POOL_INFO_FILE), 'w') as fp:
+            json.dump({'python': info['python'], 'packages': info['packages'], 'envdir': envdir}, fp)
+
+        os.rename(temp_path, pooled_env)
+
+    except Exception as e:
+        log.debug('Could not add %s to env pool: %s', envdir, e)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        return pooled_env if os.path.exists(pooled_env) else None  # May have been added by another test
+
+    evict_envs(keep=pooled_env)
+
+    return pooled_env
+
+
+def closest_env(python_version, requirements):
+    """
+    Returns the path to the pooled env with the Python version that has the most of the requirements installed, and
+    then the least other packages, or None if no pooled env has any of them.
+
+    :param str python_version: Python version, such as 3.7.9
+    :param set requirements: Names of the required packages
+    """
+    pool_dir = env_pool_dir()
+    if not pool_dir or not os.path.exists(pool_dir):
+        return None
+
+    requirements = set(canonical_name(r) for r in requirements)
+    closest = None
+
+    for name in os.listdir(pool_dir):
+        try:
+            with open(os.path.join(pool_dir, name, POOL_INFO_FILE)) as fp:
+                info = json.load(fp)
+
+        except Exception:
+            continue  # Not a pooled env, or it is still being added
+
+        if info['python'] != python_version:
+            continue
+
+        packages = set(info['packages'])
+        score = (len(packages & requirements), -len(packages - requirements))
+
+        if score[0] and (not closest or score > closest[0]):
+            closest = (score, os.path.join(pool_dir, name))
+
+    return closest and closest[1]
+
+
+def clone_env(pooled_env, envdir, python):
+    """
+    Creates an env from the pooled env by hardlinking its site-packages, and copying its scripts.
+
+    :param str pooled_env: Path to the pooled env to clone from
+    :param str envdir: Path to the env to create
+    :param str python: Python executable to create the env with
+    :return: True if the env was created
+    """
+    try:
+        with open(os.path.join(pooled_env, POOL_INFO_FILE)) as fp:
+            pooled_from = json.load(fp)['envdir']
+
+        run([python, '-m', 'venv', '--without-pip', envdir], silent=True)
+        site_packages = run([os.path.join(envdir, 'bin', 'python'), '-c',
+                             'import sysconfig; print(sysconfig.get_paths()["purelib"])'], return_output=True).strip()
+
+        _link_tree(os.path.join(pooled_env, 'site-packages'), site_packages)
+
+        for script in os.listdir(os.path.join(pooled_env, 'bin')):
+            script_path = os.path.join(envdir, 'bin', script)
+            if os.path.exists(script_path):
+                continue
+
+            with open(os.path.join(pooled_env, 'bin', script), 'rb') as fp:
+                content = fp.read()
+
+            # Scripts run with the python of the env they were installed in
+            with open(script_path, 'wb') as fp:
+                fp.write(content.replace(pooled_from.encode('utf-8'), envdir.encode('utf-8')))
+            os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        os.utime(pooled_env, None)
+
+        return True
+
+    except Exception as e:
+        log.debug('Could not clone %s from %s: %s', envdir, pooled_env, e)
+        shutil.rmtree(envdir, ignore_errors=True)
+        return False
+
+
+def evict_envs(keep=None):
+    """
+    Removes least recently used envs from the pool until it has at most config test.env_pool_size envs.
+
+    :param str keep: Path to a pooled env to keep regardless, such as the one that was just added.
+    :return: List of removed env paths
+    """
+    pool_dir = env_pool_dir()
+    if not pool_dir or not os.path.exists(pool_dir):
+        return []
+
+    pooled_envs = [os.path.join(pool_dir, name) for name in os.listdir(pool_dir) if not name.endswith('.tmp')]
+    pooled_envs.sort(key=lambda p: os.stat(p).st_mtime, reverse=True)
+
+    removed = []
+    for pooled_env in pooled_envs[int(config.test.env_pool_size):]:
+        if pooled_env != keep:
+            shutil.rmtree(pooled_env, ignore_errors=True)
+            removed.append(pooled_env)
+
+    if removed:
+        log.debug('Removed %d least recently used env(s) from the pool', len(removed))
+
+    return removed
+
+
+def _json_output(cmd):
+    """ Runs the command and returns its JSON output, ignoring other output such as warnings """
+    output = run(cmd, return_output=True)
+
+    for line in reversed(output.split('\n')):
+        if line.startswith(('[', '{')):
+            return json.loads(line)
+
+    raise ValueError('No JSON output from {}: {}'.format(' '.join(cmd), output))
+
+
+def _link_tree(src, dst, exclude=None):
+    """
+    Recreates the src tree in dst with hardlinks to its files. Files that are changed in place, such as .pth files, are
+    copied instead, as are all files when hardlinks are not supported (e.g. across filesystems). Files changed by pip
+    are removed and recreated instead of changed in place, so that does not affect the other linked trees.
+
+    :param callable exclude: Function that accepts a top level file / dir name in src, and returns True to skip it.
+    """
+    for root, dirs, files in os.walk(src):
+        if root == src and exclude:
+            dirs[:] = [d for d in dirs if not exclude(d)]
+            files = [f for f in files if not exclude(f)]
+
+        target_dir = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target_dir, exist_ok=True)
+
+        for name in files:
+            source, target = os.path.join(root, name), os.path.join(target_dir, name)
+
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+
+            if not name.endswith('.pth'):
+                try:
+                    os.link(source, target)
+                    continue
+                except OSError:
+                    pass
+
+            shutil.copy2(source, target)
+
+
+def _scripts(site_packages, exclude=None):
+    """ Names of the scripts in the env's bin dir that were installed by the packages in site_packages """
+    scripts = set()
+
+    for name in os.listdir(site_packages):
+        if exclude and exclude(name):
+            continue
+
+        for record_file in ('RECORD', 'installed-files.txt'):
+            record_path = os.path.join(site_packages, name, record_file)
+            if os.path.isfile(record_path):
+                with open(record_path) as fp:
+                    for line in fp:
+                        path = line.split(',')[0].strip()
+                        if '/bin/' in path and path.startswith('..'):
+                            scripts.add(os.path.basename(path))
+
+    bin_dir = os.path.join(os.path.dirname(site_packages), '..', '..', 'bin')
+    return sorted(s for s in scripts if os.path.isfile(os.path.join(bin_dir, s)))
@@ -1,29 +1,175 @@
 from __future__ import absolute_import
+import codecs
+from collections import namedtuple, OrderedDict
+import hashlib
+import json
 import logging
 import os
 import re
+import shutil
+import subprocess
 import sys
+import threading
+import time
+from weakref import WeakKeyDictionary
 
 import click
-import requests
-from utils.process import run, silent_run
+from utils import process
 
 from workspace.config import config
-from workspace.utils import parent_path_with_dir, parent_path_with_file, shortest_id
+from workspace.tracer import record_subprocess
+from workspace.utils import add_progress_info, invalidate_parent_paths, parent_path_with_dir, parent_path_with_file, shortest_id
 
 
 log = logging.getLogger(__name__)
 
-REMOTE_BRANCH_RE = re.compile(r'^(\*)? *(\((?:HEAD detached at|no branch, rebasing) )?([^ )]+)\)? +\w+ +(?:\[(.+)/([^:\] ]+).*])?')
 DEFAULT_REMOTE = 'origin'
 UPSTREAM_REMOTE = 'upstream'
-USER_REPO_REFERENCE_RE = re.compile('^[\w-]+/[\w-]+$')
+USER_REPO_REFERENCE_RE = re.compile(r'^[\w-]+/[\w-]+$')
+PRODUCT_NAME_RE = re.compile(r'^[\w-]+$')
+SEARCH_CACHE_FILE = os.path.join('~', '.cache', 'workspace', 'search.json')
+
+#: Format for git log -z to get the fields of :class:`Commit`, which are separated by NUL so any message can be parsed.
+COMMIT_LOG_FORMAT = '%H%x00%h%x00%P%x00%s%x00%b'
+COMMIT_LOG_CHUNK_SIZE = 64 * 1024
+
+#: Progress output from git fetch / clone with --progress, which is not part of the error message
+PROGRESS_LINE_RE = re.compile(r'^(remote: )?(Enumerating|Counting|Compressing|Receiving|Resolving|Unpacking|Total|'
+                              r'Updating files|Checking out files|Filtering content)\b')
+
+#: Refs that are kept in reference mirrors. Others, such as GitHub's refs/pull/*, are not needed to clone.
+REFERENCE_REFSPECS = ['+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*']
+
+
+#: Errors from git that are likely to succeed when retried, such as from network issues or server throttling
+TRANSIENT_ERROR_RE = re.compile(
+    r'Connection (reset|refused|timed out|closed)|Could not resolve host|Operation timed out|'
+    r'(ssh|kex)_exchange_identification|remote end hung up unexpectedly|early EOF|'
+    r'The requested URL returned error: (429|5\d\d)|HTTP (429|5\d\d)|RPC failed|Temporary failure', re.IGNORECASE)
+
+
+#: Git sub-commands that do not change the repo, so they do not invalidate its cached state and queries.
+READ_ONLY_GIT_COMMANDS = {'blame', 'cat-file', 'describe', 'diff', 'for-each-ref', 'grep', 'log', 'ls-files', 'ls-remote',
+                          'merge-base', 'rev-list', 'rev-parse', 'shortlog', 'show', 'show-ref', 'status'}
 
 
 class SCMError(Exception):
     """ SCM command failed """
 
 
+class UpdateError(SCMError):
+    """ Update from remote(s) failed """
+
+    def __init__(self, message, errors):
+        super(UpdateError, self).__init__(message)
+
+        #: Map of remote name to error message
+        self.errors = errors
+
+    def is_transient(self):
+        """ True if all errors are transient, so the update is likely to succeed when retried """
+        return all(is_transient_error(error) for error in self.errors.values())
+
+
+def is_transient_error(error):
+    """ Checks if the git error message is likely to be transient, such as from network issues or throttling """
+    return bool(TRANSIENT_ERROR_RE.search(error))
+
+
+def remote_host(url):
+    """
+    Returns the host of the git remote URL, such as "github.com" for git@github.com:maxzheng/workspace-tools.git,
+    or "localhost" for local paths.
+    """
+    match = re.match(r'^(?:[\w+.-]+://)?(?:[^@/]+@)?([^:/]+)(?::|/)', url)
+    if match and (':' in url.split('/')[0] or '://' in url) and not url.startswith('file://'):
+        return match.group(1).lower()
+    return 'localhost'
+
+
+def run(cmd, *args, **kwargs):
+    """
+    Same as :func:`utils.process.run`, but commands that may change the repo invalidate its cached
+    :class:`RepoState` and :func:`git_query` results first. Only read-only git commands per :func:`is_read_only_git`
+    do not, as other commands (e.g. rm or setup.py) may change files that git status / diff report on.
+    """
+    _invalidate_if_mutating(cmd, kwargs.get('cwd'))
+    return process.run(cmd, *args, **kwargs)
+
+
+def silent_run(cmd, *args, **kwargs):
+    """ Same as :func:`utils.process.silent_run`, but invalidates cached repo state like :func:`run` """
+    _invalidate_if_mutating(cmd, kwargs.get('cwd'))
+    return process.silent_run(cmd, *args, **kwargs)
+
+
+def is_read_only_git(cmd):
+    """ Checks if the command is a git command that does not change the repo, such as git log """
+    sub_command, args = _git_sub_command(cmd)
+
+    if sub_command == 'remote':
+        return all(arg in ('-v', '--verbose') for arg in args)
+    elif sub_command == 'config':
+        return any(arg.startswith('--get') or arg in ('-l', '--list') for arg in args)
+    else:
+        return sub_command in READ_ONLY_GIT_COMMANDS
+
+
+def _git_sub_command(cmd):
+    """ Returns a tuple of (sub-command, args) for the git command, or (None, []) if it is not a git command """
+    if isinstance(cmd, str):
+        cmd = cmd.split()
+
+    if not cmd or cmd[0] != 'git':
+        return None, []
+
+    args = list(cmd[1:])
+    while args and args[0].startswith('-'):
+        option = args.pop(0)
+        if option in ('-c', '-C') and args:
+            args.pop(0)
+
+    return (args[0], args[1:]) if args else (None, [])
+
+
+def _invalidate_if_mutating(cmd, cwd=None):
+    if not is_read_only_git(cmd):
+        invalidate_repo_state(cwd)
+
+
+_git_queries = {}
+
+#: Number of :func:`git_query` calls that were answered from cache (hits) or ran git (misses)
+git_query_stats = {'hits': 0, 'misses': 0}
+
+
+def git_query(cmd, cwd=None):
+    """
+    Runs a read-only git command, such as git log, and returns a tuple of (output, success).
+
+    Results are memoized by cwd and command until a command that may change the repo is run using :func:`run` /
+    :func:`silent_run`, or :func:`invalidate_repo_state` is called for the repo, such as at the start of each command.
+    Commands that change the repo should be run using those instead of :mod:`utils.process` directly.
+
+    :param list/str cmd: Read-only git command per :func:`is_read_only_git`
+    :param str cwd: Directory to run the command in. Defaults to current.
+    """
+    if isinstance(cmd, str):
+        cmd = cmd.split()
+
+    queries = _git_queries.setdefault(_repo_state_key(cwd), {})
+    key = (os.path.abspath(cwd or os.getcwd()), tuple(cmd))
+
+    if key in queries:
+        git_query_stats['hits'] += 1
+        return queries[key]
+
+    git_query_stats['misses'] += 1
+    result = queries[key] = process.silent_run(cmd, cwd=cwd, return_output=2)
+
+    return result
+
+
 def workspace_path():
     """ Guess the workspace path based on if we are in a repo or not. """
     repo_path = is_repo()
@@ -49,7 +195,13 @@ def commit_logs(limit=None, repo=None, diff=False, show_revision=None, extra_arg
     if extra_args:
         cmd.extend(extra_args)
 
-    return run(cmd, return_output=not to_pager, shell=to_pager, cwd=repo)
+    if to_pager:
+        return run(cmd, shell=True, cwd=repo)
+
+    output, success = git_query(cmd, cwd=repo)
+    if not success:
+        raise SCMError(output.strip())
+    return output
 
 
 def add_files(files=None):
@@ -68,33 +220,6 @@ def repo_check():
         sys.exit(1)
 
 
-def extract_commit_msgs(output, is_git=True):
-    """ Returns a list of commit msgs from the given output. """
-    msgs = []
-
-    if output:
-        msg = []
-
-        for line in output.split('\n'):
-            if not line:
-                continue
-
-            is_commit_msg = line.startswith(' ') or not line
-
-            if is_commit_msg:
-                if is_git and line.startswith('    '):
-                    line = line[4:]
-                msg.append(line)
-            elif msg:
-                msgs.append('\n'.join(msg))
-                msg = []
-
-        if msg:
-            msgs.append('\n'.join(msg))
-
-    return msgs
-
-
 def is_repo(path=None):
     """ Check if we are inside of a git repo. """
     return repo_path(path=path)
@@ -122,19 +247,312 @@ def product_repos():
 
 def repos(dir=None):
     """ Returns a list of repos either for the given directory or current directory or in sub-directories. """
-    repos = []
     cwd = dir or os.getcwd()
 
     if is_repo(cwd):
-        repos.append(repo_path(cwd))
-        return repos
+        return [repo_path(cwd)]
+
+    return workspace_index(cwd).repos
+
+
+class WorkspaceIndex(object):
+    """
+    Index of the repos in a workspace.
+
+    It is stored in :attr:`FILE_NAME` under the workspace, and is rebuilt when the workspace directory's mtime changes,
+    such as when a product is checked out or removed, when an indexed repo no longer has a .git, or when the mtime of
+    a sub-dir that is not a repo changes, such as when it becomes one with `git init`.
+    """
+    #: Path of the index file relative to the workspace. It is in a sub-dir so that saving it does not change the
+    #: workspace dir's mtime.
+    FILE_NAME = os.path.join('.wst', 'index.json')
+
+    def __init__(self, path):
+        """
+        :param str path: Path to the workspace
+        """
+        #: Path to the workspace
+        self.path = path
+        #: Sorted list of repo paths
+        self.repos = []
+        #: mtime of the workspace when the index was built
+        self.mtime = None
+        #: Map of sub-dirs that are not repos to their mtime when the index was built
+        self.other_dirs = {}
+
+        self._load()
+
+    @property
+    def index_file(self):
+        return os.path.join(self.path, self.FILE_NAME)
+
+    def is_valid(self):
+        """ Check if the workspace has not changed since the index was built """
+        try:
+            if self.mtime != os.stat(self.path).st_mtime:
+                return False
+
+            if not all(os.path.exists(os.path.join(repo, '.git')) for repo in self.repos):
+                return False
+
+            return all(os.stat(path).st_mtime == mtime for path, mtime in self.other_dirs.items())
+
+        except OSError:
+            return False
+
+    def _load(self):
+        try:
+            with open(self.index_file) as fp:
+                data = json.load(fp)
+            self.mtime = data['mtime']
+            self.repos = sorted(data['repos'])
+            self.other_dirs = data['other_dirs']
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+
+        if not self.is_valid():
+            self._build()
+
+    def _build(self):
+        log.debug('Building workspace index for %s', self.path)
+
+        self.mtime = os.stat(self.path).st_mtime
+        self.repos = []
+        self.other_dirs = {}
+
+        index_dir = os.path.dirname(self.index_file)
+
+        for dir in os.listdir(self.path):
+            path = os.path.join(self.path, dir)
+            if os.path.exists(os.path.join(path, '.git')):
+                self.repos.append(path)
+            elif os.path.isdir(path) and path != index_dir:  # Saving the index changes the index dir's mtime.
+                self.other_dirs[path] = os.stat(path).st_mtime
+
+        self.repos.sort()
+
+        if self.repos and not os.path.exists(index_dir):  # Avoid creating index in random dirs without any repos.
+            try:
+                os.makedirs(index_dir)
+                self.mtime = os.stat(self.path).st_mtime  # Creating the dir changes the workspace mtime
+            except OSError as e:
+                log.debug('Could not create %s: %s', index_dir, e)
+
+        self._save()
+
+    def _save(self):
+        if not os.path.isdir(os.path.dirname(self.index_file)):
+            return
+
+        temp_file = '{}.{}.{}'.format(self.index_file, os.getpid(), threading.get_ident())
+
+        try:
+            with open(temp_file, 'w') as fp:
+                json.dump({'mtime': self.mtime, 'repos': self.repos, 'other_dirs': self.other_dirs}, fp)
+            os.rename(temp_file, self.index_file)  # Atomic, so concurrent commands never see a partial index.
+
+        except (IOError, OSError) as e:
+            log.debug('Could not save workspace index to %s: %s', self.index_file, e)
+
+
+_workspace_indexes = {}
+
+
+def workspace_index(dir=None):
+    """
+    Returns the :class:`WorkspaceIndex` for the given or current workspace dir.
+
+    It is cached for the process, and rebuilt as needed when the workspace changes (see :meth:`WorkspaceIndex.is_valid`).
+    """
+    path = os.path.abspath(dir or workspace_path())
+    index = _workspace_indexes.get(path)
 
-    for dir in os.listdir(cwd):
-        path = os.path.join(cwd, dir)
-        if os.path.isdir(path) and is_repo(path):
-            repos.append(path)
+    if not index:
+        index = _workspace_indexes[path] = WorkspaceIndex(path)
+    elif not index.is_valid():
+        index._build()
 
-    return repos
+    return index
+
+
+class ProductUrlResolver(object):
+    """
+    Resolves product names to repo URLs for single word checkouts (e.g. wst checkout workspace-tools) using the
+    search API at `config.checkout.search_api_url`, such as GitHub's repo search.
+
+    Resolved URLs are cached on disk for `config.checkout.search_cache_days`, so repeated checkouts do not need the
+    API. Names are searched for in batches, and requests share a pooled HTTP session. When the API responds with
+    rate limit headers that say no requests are remaining, the next request waits for the limit to reset.
+    """
+    #: Max number of names to search for in one request. GitHub allows up to 5 OR operators in a query.
+    BATCH_SIZE = 6
+
+    #: Max number of seconds to wait for the rate limit to reset before giving up.
+    MAX_RATE_LIMIT_WAIT = 60
+
+    def __init__(self, cache_file):
+        self.cache_file = os.path.expanduser(cache_file)
+
+        #: Epoch time when requests are allowed again if the rate limit was reached
+        self.rate_limit_reset = None
+
+        self._session = None
+        self._cache = None
+        self._resolved = {}  # Resolved during this process regardless of the cache duration
+        self._not_found = set()  # Not found during this process, which are not cached on disk as they may be created
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if not self._session:
+            import requests  # Imported as needed as it is slow to import, which adds to the startup time of all commands.
+
+            logging.getLogger('requests').setLevel(logging.WARN)
+            self._session = requests.Session()
+        return self._session
+
+    def resolve(self, name):
+        """ Returns the repo URL for the product name. Raises SCMError if it can not be resolved. """
+        return self.resolve_all([name])[name]
+
+    def resolve_all(self, names):
+        """
+        Returns a dict of product name to repo URL for the given names. Raises SCMError if any can not be resolved.
+
+        Names that are not cached are searched together in batches of :attr:`BATCH_SIZE`, and names that are not
+        matched exactly by a batch search are searched individually with the first result used.
+        """
+        urls = dict((name, self._cached_url(name)) for name in names)
+        uncached = [name for name in names if not urls[name] and name not in self._not_found]
+
+        try:
+            for i in range(0, len(uncached), self.BATCH_SIZE):
+                batch = uncached[i:i + self.BATCH_SIZE]
+                found = {}
+
+                if len(batch) > 1:
+                    # First item for a name wins as results are sorted by relevance
+                    results = self._search(' OR '.join(batch))
+                    repos = dict((repo['name'].lower(), repo['ssh_url']) for repo in reversed(results))
+                    found.update((name, repos[name.lower()]) for name in batch if name.lower() in repos)
+
+                for name in batch:
+                    if name not in found:
+                        repos = self._search(name)
+                        if repos:
+                            found[name] = repos[0]['ssh_url']
+
+                urls.update(found)
+                self._cache_urls(found)
+
+        except SCMError:
+            raise
+
+        except Exception as e:
+            raise SCMError('Could not find repo for {} using {} due to error: {}'.format(
+                ', '.join(uncached), config.checkout.search_api_url, e))
+
+        missing = [name for name in names if not urls[name]]
+        self._not_found.update(missing)
+
+        if missing:
+            raise SCMError('No repo matching "{}" found.'.format('", "'.join(missing)))
+
+        return urls
+
+    def _search(self, query):
+        """ Returns the list of repos from the search API for the query """
+        for _ in range(2):
+            self._wait_for_rate_limit()
+
+            response = self.session.get(config.checkout.search_api_url, params={'q': query}, timeout=10)
+            self._update_rate_limit(response)
+
+            if response.status_code not in (403, 429) or not self.rate_limit_reset:
+                break
+
+        response.raise_for_status()
+        return response.json()['items']
+
+    def _update_rate_limit(self, response):
+        reset = None
+
+        try:
+            if 'Retry-After' in response.headers:
+                reset = time.time() + float(response.headers['Retry-After'])
+            elif response.headers.get('X-RateLimit-Remaining') == '0':
+                reset = float(response.headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            log.debug('Ignoring invalid rate limit headers: %s', response.headers)
+
+        self.rate_limit_reset = reset
+
+    def _wait_for_rate_limit(self):
+        wait = self.rate_limit_reset and self.rate_limit_reset - time.time()
+
+        if not wait or wait <= 0:
+            return
+
+        if wait > self.MAX_RATE_LIMIT_WAIT:
+            raise SCMError('Search API rate limit for {} was reached. Please try again in {:.0f} seconds.'.format(
+                config.checkout.search_api_url, wait))
+
+        click.echo('Waiting {:.0f} seconds for search API rate limit to reset'.format(wait))
+        time.sleep(wait)
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_file) as fp:
+                    self._cache = json.load(fp)
+            except (IOError, OSError, ValueError):
+                self._cache = {}
+
+        return self._cache
+
+    def _cached_url(self, name):
+        ttl = float(config.checkout.search_cache_days or 0) * 86400
+
+        with self._lock:
+            entry = self._resolved.get(name) or self._load_cache().get(name)
+
+        if (entry and entry['search_api_url'] == config.checkout.search_api_url and
+                (name in self._resolved or time.time() - entry['time'] < ttl)):
+            return entry['url']
+
+    def _cache_urls(self, urls):
+        with self._lock:
+            for name, url in urls.items():
+                self._resolved[name] = {'url': url, 'search_api_url': config.checkout.search_api_url, 'time': time.time()}
+
+            if not urls or not config.checkout.search_cache_days:
+                return
+
+            cache = self._load_cache()
+            cache.update((name, self._resolved[name]) for name in urls)
+
+            temp_file = '{}.{}.{}'.format(self.cache_file, os.getpid(), threading.get_ident())
+
+            try:
+                if not os.path.isdir(os.path.dirname(self.cache_file)):
+                    os.makedirs(os.path.dirname(self.cache_file))
+                with open(temp_file, 'w') as fp:
+                    json.dump(cache, fp)
+                os.rename(temp_file, self.cache_file)
+
+            except (IOError, OSError) as e:
+                log.debug('Could not save search cache to %s: %s', self.cache_file, e)
+
+
+_product_url_resolvers = {}
+
+
+def product_url_resolver():
+    """ Returns the :class:`ProductUrlResolver` for :data:`SEARCH_CACHE_FILE`. It is cached for the process. """
+    if SEARCH_CACHE_FILE not in _product_url_resolvers:
+        _product_url_resolvers[SEARCH_CACHE_FILE] = ProductUrlResolver(SEARCH_CACHE_FILE)
+
+    return _product_url_resolvers[SEARCH_CACHE_FILE]
 
 
 def checkout_branch(branch, repo_path=None):
@@ -153,12 +571,14 @@ def checkout_branch(branch, repo_path=None):
     if name:
         cmd.extend(['-B', name])
 
+    invalidate_repo_state(repo_path)
     silent_run(cmd, cwd=repo_path)
 
     if name:
-        upstream_branch = '{}/{}'.format(upstream_remote(), name)
-        if 'remotes/{}'.format(upstream_branch) in all_branches(remotes=True):
-            silent_run('git branch --set-upstream-to {}'.format(upstream_branch))
+        upstream_branch = '{}/{}'.format(upstream_remote(repo=repo_path), name)
+        if 'remotes/{}'.format(upstream_branch) in all_branches(repo=repo_path, remotes=True):
+            invalidate_repo_state(repo_path)
+            silent_run('git branch --set-upstream-to {}'.format(upstream_branch), cwd=repo_path)
         else:
             click.echo('FYI Can not change upstream tracking branch to {} as it does not exist'.format(upstream_branch))
 
@@ -168,15 +588,18 @@ def create_branch(branch, from_branch=None):
     cmd = ['git', 'checkout', '-b', branch]
     if from_branch:
         cmd.append(from_branch)
+    invalidate_repo_state()
     silent_run(cmd)
 
 
 def update_branch(repo=None, parent='master'):
+    invalidate_repo_state(repo)
     silent_run('git rebase {}'.format(parent), cwd=repo)
 
 
 def remove_branch(branch, raises=False, remote=False, force=False):
     """ Removes branch """
+    invalidate_repo_state()
     run(['git', 'branch', '-D' if force else '-d', branch], raises=raises)
 
     if remote:
@@ -184,6 +607,7 @@ def remove_branch(branch, raises=False, remote=False, force=False):
 
 
 def rename_branch(branch, new_branch):
+    invalidate_repo_state()
     silent_run(['git', 'branch', '-m', branch, new_branch])
 
 
@@ -209,15 +633,277 @@ def merge_branch(branch, commit=None, strategy=None, user=None):
     else:
         cmd.append(branch)
 
+    invalidate_repo_state()
     silent_run(cmd)
 
 
+class Commit(namedtuple('Commit', 'sha short_sha parents subject body')):
+    """ A commit from :func:`commits` / :func:`iter_commits` that shows as a one line summary like git log --oneline """
+
+    @property
+    def message(self):
+        """ Full commit message with the subject and body """
+        return self.subject + ('\n\n' + self.body if self.body else '')
+
+    def __str__(self):
+        return '{} {}'.format(self.short_sha, self.subject)
+
+
+def iter_commits(revision_range=None, repo=None, limit=None):
+    """
+    Iterates over :class:`Commit` in the revision range, newest first, as they are read from git log.
+
+    Only the current commit is kept in memory, and git log is stopped when the iterator is closed, such as when the
+    consumer breaks out of the loop after finding the commit it is looking for.
+
+    :param str revision_range: Revision range to get commits for, such as 'master..feature'. Defaults to HEAD.
+    :param str repo: Path to repo. Defaults to current.
+    :param int limit: Max number of commits
+    """
+    cmd = ['git', 'log', '-z', '--format=' + COMMIT_LOG_FORMAT]
+    if limit:
+        cmd.append('-%d' % limit)
+    if revision_range:
+        cmd.append(revision_range)
+
+    log.debug('Running: %s %s', ' '.join(cmd), '[%s]' % repo if repo else '')
+    git_log = subprocess.Popen(cmd, cwd=repo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    chunks = iter(lambda: decoder.decode(git_log.stdout.read1(COMMIT_LOG_CHUNK_SIZE)), '')
+    finished = False
+
+    try:
+        yield from _parse_commits(chunks)
+        finished = True
+
+    finally:
+        if not finished and git_log.poll() is None:
+            git_log.kill()
+        _, error = git_log.communicate()
+
+        if finished and git_log.returncode:
+            raise SCMError('Failed to get commits for {}: {}'.format(revision_range or 'HEAD',
+                                                                     error.decode('utf-8', 'replace').strip()))
+
+
+def _parse_commits(chunks):
+    """ Yields :class:`Commit` from chunks of git log output in :data:`COMMIT_LOG_FORMAT` """
+    field_count = len(Commit._fields)
+    fields = []
+    partial_field = ''
+
+    for chunk in chunks:
+        *complete_fields, partial_field = (partial_field + chunk).split('\0')
+
+        for field in complete_fields:
+            fields.append(field)
+
+            if len(fields) == field_count:
+                sha, short_sha, parents, subject, body = fields
+                yield Commit(sha, short_sha, parents.split(), subject, body.strip())
+                fields = []
+
+
+def commits(revision_range, repo=None):
+    """
+    Returns a list of :class:`Commit` in the revision range, newest first, from a single git log call.
+
+    :param str revision_range: Revision range to get commits for, such as 'master..feature'
+    :param str repo: Path to repo. Defaults to current.
+    """
+    output, success = git_query(['git', 'log', '-z', '--format=' + COMMIT_LOG_FORMAT, revision_range], cwd=repo)
+
+    if not success:
+        raise SCMError('Failed to get commits for {}: {}'.format(revision_range, output.strip()))
+
+    return list(_parse_commits([output]))
+
+
+def is_dirty(repo=None):
+    """ Checks if the repo has modified, staged, or untracked files """
+    output = silent_run(['git', 'status', '--porcelain=v2', '--untracked-files=normal'], cwd=repo, return_output=True)
+    return bool(output.strip())
+
+
 def diff_branch(right_branch, left_branch='master', path=None):
     cmd = 'git log %s..%s' % (left_branch, right_branch)
 
     return run(cmd, cwd=path, return_output=True)
 
 
+class RepoState(object):
+    """
+    Snapshot of the branches, tracking branches, remotes and HEAD of a repo.
+
+    It is collected with a single ``git for-each-ref`` and ``git remote -v`` call, and is shared by all
+    :func:`repo_state` callers until :func:`invalidate_repo_state` is called for the repo.
+    """
+
+    #: Commands that the snapshot is collected from
+    REMOTES_CMD = ['git', 'remote', '-v']
+    REFS_CMD = ['git', 'for-each-ref', '--format=%(HEAD)%00%(refname)%00%(upstream)', 'refs/heads', 'refs/remotes']
+
+    def __init__(self, path, outputs=None):
+        """
+        :param str path: Path to the repo
+        :param tuple outputs: Tuple of (output, success) results from running :attr:`REMOTES_CMD` and :attr:`REFS_CMD`
+                              if they were already run, such as by :func:`async_repo_state`. Defaults to run them.
+        """
+        #: Path to the repo
+        self.path = path
+        #: Local branch names sorted by name
+        self.branches = []
+        #: Remote branches as "remote/branch" sorted by name
+        self.remote_branches = []
+        #: Map of local branch to its tracking branch as a tuple of (remote, branch)
+        self.tracking = {}
+        #: Map of remote name to its fetch URL in the order of ``git remote``
+        self.remote_urls = OrderedDict()
+        #: Current branch or None if HEAD is detached or the branch has no commit yet
+        self.head = None
+        #: Detached HEAD as a short commit hash, or the branch being rebased.
+        self.detached = None
+        #: Set if HEAD is detached due to a rebase
+        self.rebasing = False
+
+        if not outputs:
+            outputs = [git_query(cmd, cwd=path) for cmd in (self.REMOTES_CMD, self.REFS_CMD)]
+
+        self._parse(*outputs)
+
+    @property
+    def remotes(self):
+        return list(self.remote_urls)
+
+    def _parse(self, remotes_result, refs_result):
+        remotes_output, success = remotes_result
+        if not success:
+            log.debug('Could not get remotes for %s: %s', self.path, remotes_output)
+            return
+
+        for line in remotes_output.split('\n'):
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] not in self.remote_urls:
+                self.remote_urls[parts[0]] = parts[1]
+
+        refs_output, success = refs_result
+        if not success:
+            log.debug('Could not get refs for %s: %s', self.path, refs_output)
+            return
+
+        for line in refs_output.split('\n'):
+            if not line:
+                continue
+
+            head, ref, upstream = line.split('\0')
+
+            if ref.startswith('refs/heads/'):
+                branch = ref[len('refs/heads/'):]
+                self.branches.append(branch)
+
+                if head == '*':
+                    self.head = branch
+
+                tracking = self._split_remote_ref(upstream)
+                if tracking:
+                    self.tracking[branch] = tracking
+
+            elif ref.startswith('refs/remotes/') and not ref.endswith('/HEAD'):
+                self.remote_branches.append(ref[len('refs/remotes/'):])
+
+        if not self.head:
+            self._collect_detached_head()
+
+    def _split_remote_ref(self, ref):
+        """ Split refs/remotes/<remote>/<branch> into (remote, branch) using known remotes """
+        for remote in self.remote_urls:
+            prefix = 'refs/remotes/{}/'.format(remote)
+            if ref.startswith(prefix):
+                return remote, ref[len(prefix):]
+
+    def _collect_detached_head(self):
+        """ HEAD is not on a branch, so read it directly to avoid another git call. """
+        git_dir = _git_dir(self.path)
+        if not git_dir:
+            return
+
+        try:
+            with open(os.path.join(git_dir, 'HEAD')) as fp:
+                head = fp.read().strip()
+        except IOError:
+            return
+
+        if not head or head.startswith('ref:'):  # Branch without any commit yet
+            return
+
+        for rebase_dir in ('rebase-merge', 'rebase-apply'):
+            head_name_file = os.path.join(git_dir, rebase_dir, 'head-name')
+            if os.path.exists(head_name_file):
+                with open(head_name_file) as fp:
+                    self.detached = fp.read().strip().split('refs/heads/', 1)[-1]
+                    self.rebasing = True
+                    return
+
+        self.detached = head[:7]
+
+
+_repo_states = {}
+
+
+def _git_dir(path=None):
+    """ Returns the .git dir for the repo at path, following "gitdir:" links used by worktrees / submodules. """
+    top = repo_path(path)
+    if not top:
+        return None
+
+    git_dir = os.path.join(top, '.git')
+    if os.path.isfile(git_dir):
+        with open(git_dir) as fp:
+            content = fp.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = os.path.join(top, content[len('gitdir:'):].strip())
+
+    return git_dir
+
+
+def _repo_state_key(repo=None):
+    path = repo or os.getcwd()
+    return repo_path(path) or path
+
+
+def repo_state(repo=None):
+    """
+    Returns the :class:`RepoState` snapshot for the given or current repo.
+
+    The snapshot is cached until :func:`invalidate_repo_state` is called for the repo, which scm functions that
+    change refs do automatically.
+    """
+    key = _repo_state_key(repo)
+    state = _repo_states.get(key)
+
+    if not state:
+        state = _repo_states[key] = RepoState(key)
+
+    return state
+
+
+def invalidate_repo_state(repo=None, all=False):
+    """
+    Invalidate the cached :class:`RepoState` and :func:`git_query` results for the given or current repo.
+
+    :param str repo: Path to repo. Defaults to current.
+    :param bool all: Invalidate all repos instead, such as at the start of a command.
+    """
+    if all:
+        _repo_states.clear()
+        _git_queries.clear()
+        git_query_stats.update(hits=0, misses=0)
+    else:
+        key = _repo_state_key(repo)
+        _repo_states.pop(key, None)
+        _git_queries.pop(key, None)
+
+
 def all_remotes(repo=None):
     """ Return all remotes with default remote as the 1st """
     remotes = _all_remotes(repo=repo)
@@ -230,14 +916,7 @@ def all_remotes(repo=None):
 
 def _all_remotes(repo=None):
     """ Returns all remotes. """
-    remotes_output = silent_run('git remote', cwd=repo, return_output=True)
-    remotes = []
-
-    if remotes_output:
-        for remote in remotes_output.split('\n'):
-            if remote:
-                remote = remote.strip()
-                remotes.append(remote)
+    remotes = repo_state(repo).remotes
 
     required_remotes = {
         DEFAULT_REMOTE: 'Your fork of the upstream repo',
@@ -273,58 +952,51 @@ def upstream_remote(repo=None, remotes=None):
 
 
 def remote_tracking_branch(repo=None):
-    remote_output = silent_run('git rev-parse --abbrev-ref --symbolic-full-name @{u}', cwd=repo, return_output=True)
+    """ Returns the remote tracking branch of the current branch as "remote/branch", or None if not tracking. """
+    state = repo_state(repo)
+    tracking = state.head and state.tracking.get(state.head)
 
-    if 'no upstream' in remote_output:
-        return None
-    else:
-        return remote_output
+    if tracking:
+        return '/'.join(tracking)
 
 
 def all_branches(repo=None, remotes=False, verbose=False):
     """ Returns all branches. The first element is the current branch. """
-    cmd = ['git', 'branch']
-    if remotes:
-        cmd.append('--all')
-    if verbose:
-        cmd.append('-vv')
-
-    branch_output = silent_run(cmd, cwd=repo, return_output=True)
+    state = repo_state(repo)
     branches = []
-    remotes = all_remotes(repo=repo)
-    up_remote = remotes and upstream_remote(repo=repo, remotes=remotes)
-    def_remote = remotes and default_remote(repo=repo, remotes=remotes)
-
-    if branch_output:
-        for branch in branch_output.split('\n'):
-            branch = branch.strip()
-            if branch:
-                if verbose:
-                    star, detached, local_branch, remote, branch = REMOTE_BRANCH_RE.search(branch).groups()
-                    if remote and remotes:
-                        # Rightful/tracking remote differs based on parent vs child branch:
-                        #   Parent branch = upstream remote
-                        #   Child branch = origin remote
-                        rightful_remote = (remote == up_remote and '@' not in local_branch or
-                                           remote == def_remote and '@' in local_branch)
-                        branch = local_branch if rightful_remote else '{}^{}'.format(local_branch, shortest_id(remote, remotes))
-
-                    elif detached:
-                        branch = local_branch + '*'
-
-                    else:
-                        branch = local_branch
-
-                    if star:
-                        branches.insert(0, branch)
-                    else:
-                        branches.append(branch)
-
-                else:
-                    if branch.startswith('*'):
-                        branches.insert(0, branch.strip('* '))
-                    else:
-                        branches.append(branch)
+
+    if verbose and state.remotes:
+        remote_names = all_remotes(repo=repo)
+        up_remote = upstream_remote(repo=repo, remotes=remote_names)
+        def_remote = default_remote(repo=repo, remotes=remote_names)
+
+    for branch in state.branches:
+        if verbose and state.remotes and branch in state.tracking:
+            remote, _ = state.tracking[branch]
+
+            # Rightful/tracking remote differs based on parent vs child branch:
+            #   Parent branch = upstream remote
+            #   Child branch = origin remote
+            rightful_remote = (remote == up_remote and '@' not in branch or
+                               remote == def_remote and '@' in branch)
+            if not rightful_remote:
+                branch = '{}^{}'.format(branch, shortest_id(remote, list(remote_names)))
+
+        if branch == state.head:
+            branches.insert(0, branch)
+        else:
+            branches.append(branch)
+
+    if state.detached:
+        if verbose:
+            branches.insert(0, state.detached + '*')
+        elif state.rebasing:
+            branches.insert(0, '(no branch, rebasing {})'.format(state.detached))
+        else:
+            branches.insert(0, '(HEAD detached at {})'.format(state.detached))
+
+    if remotes:
+        branches.extend('remotes/' + branch for branch in state.remote_branches)
 
     return branches
 
@@ -349,7 +1021,12 @@ def parent_branch(branch):
 
 
 def update_repo(path=None, quiet=False):
-    """ Updates given or current repo to HEAD """
+    """
+    Updates given or current repo to HEAD.
+
+    All remotes are fetched with one git command, and then the branch is fast-forwarded to the same branch from each
+    remote locally.
+    """
     if not remote_tracking_branch(repo=path):
         if not quiet:
             click.echo('Did not update as remote tracking is not setup for branch')
@@ -361,23 +1038,133 @@ def update_repo(path=None, quiet=False):
         click.echo('Updating ' + branch)
 
     remotes = all_remotes(repo=path)
-    failed_remotes = []
+
+    invalidate_repo_state(path)
+
+    output, success = silent_run(_fetch_cmd(remotes), cwd=path, return_output=2)
+    _record_bytes_fetched(output)
+    errors = {} if success else _fetch_errors(output, remotes)
+    remote_branches = repo_state(path).remote_branches
 
     for remote in remotes:
         if len(remotes) > 1 and not quiet:
             click.echo('    ... from ' + remote)
-        output, success = silent_run('git pull --ff-only --tags {} {}'.format(remote, branch), cwd=path, return_output=2)
+
+        if remote not in errors:
+            remote_branch = '{}/{}'.format(remote, branch)
+
+            if remote_branch not in remote_branches:
+                # Not fetched by the remote's refspecs, such as when it only fetches a single branch.
+                output, success = silent_run(['git', 'fetch', '--progress', remote, branch], cwd=path, return_output=2)
+                _record_bytes_fetched(output)
+                remote_branch = 'FETCH_HEAD'
+                if not success:
+                    errors[remote] = _pull_error(output)
+
+            if remote not in errors:
+                output, success = silent_run(['git', 'merge', '--ff-only', '--quiet', remote_branch], cwd=path,
+                                             return_output=2)
+                if not success:
+                    errors[remote] = _pull_error(output)
+
+        if remote in errors:
+            click.echo('    ...   ' + errors[remote])
+
+    if errors:
+        raise UpdateError('Failed to pull from remote(s): {}'.format(', '.join(r for r in remotes if r in errors)), errors)
+
+
+def is_up_to_date(path=None):
+    """
+    Checks if the current branch of the given or current repo is up to date with the same branch and the tags of all
+    remotes without fetching, so :func:`update_repo` can be skipped. It uses one ``git ls-remote`` per remote, which is
+    much cheaper than a fetch as no objects need to be negotiated.
+
+    :return: True if up to date, or False if it should be updated, such as when a remote has new commits or tags, the
+             branch is behind the remote branch, or the remote can not be checked.
+    """
+    branch = remote_tracking_branch(repo=path) and current_branch(repo=path)
+    if not branch:
+        return False
+
+    output, success = git_query(['git', 'for-each-ref', '--format=%(refname) %(objectname)', 'refs/heads/' + branch,
+                                 'refs/remotes', 'refs/tags'], cwd=path)
+    if not success:
+        return False
+
+    local_refs = dict(line.split(' ', 1) for line in output.splitlines() if ' ' in line)
+    head = local_refs.get('refs/heads/' + branch)
+
+    for remote in all_remotes(repo=path):
+        output, success = silent_run(['git', 'ls-remote', '--heads', '--tags', remote], cwd=path, return_output=2)
         if not success:
-            error_match = re.search(r'(?:fatal|ERROR): (.+)', output)
-            error = error_match.group(1) if error_match else output
-            click.echo('    ...   ' + error.strip(' .'))
-            failed_remotes.append(remote)
+            return False
+
+        remote_refs = dict(line.split('\t', 1)[::-1] for line in output.splitlines()
+                           if '\t' in line and not line.endswith('^{}'))
+        branch_sha = remote_refs.pop('refs/heads/' + branch, None)
+
+        if not branch_sha or local_refs.get('refs/remotes/{}/{}'.format(remote, branch)) != branch_sha:
+            return False
+
+        if any(ref.startswith('refs/tags/') and local_refs.get(ref) != sha for ref, sha in remote_refs.items()):
+            return False
+
+        if branch_sha != head and not git_query(['git', 'merge-base', '--is-ancestor', branch_sha, head], cwd=path)[1]:
+            return False
+
+    return True
+
+
+def _fetch_cmd(remotes):
+    """ Command to fetch branches and tags from all of the remotes at once """
+    return ['git', 'fetch', '--multiple', '--tags', '--progress'] + list(remotes)
+
+
+def _record_bytes_fetched(output):
+    """ Add the number of bytes received in the git fetch/clone output (with --progress) to the progress info """
+    units = {'bytes': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3}
+    received = re.findall(r'Receiving objects: 100% \(\d+/\d+\), ([\d.]+) (bytes|KiB|MiB|GiB)', output)
+
+    if received:
+        add_progress_info(bytes_fetched=int(sum(float(size) * units[unit] for size, unit in received)))
 
-    if failed_remotes:
-        raise SCMError('Failed to pull from remote(s): {}'.format(', '.join(failed_remotes)))
+
+def _fetch_errors(output, remotes):
+    """
+    Returns a dict of remote name to error message for remotes that failed in the output of a failed :func:`_fetch_cmd`
+
+    Output for each remote starts with "Fetching <remote>", and ends with "error: could not fetch <remote>" on failure.
+    """
+    errors = {}
+    sections = re.split(r'^Fetching ', output, flags=re.MULTILINE)[1:]
+
+    for section in sections:
+        remote, _, remote_output = section.partition('\n')
+        if re.search(r'^error: could not fetch {}$'.format(re.escape(remote.strip())), remote_output,
+                     flags=re.MULTILINE | re.IGNORECASE):
+            errors[remote.strip()] = _pull_error(remote_output)
+
+    if not errors:  # Failed before fetching from any remote
+        errors = dict((remote, _pull_error(output)) for remote in remotes)
+
+    return errors
+
+
+def _pull_error(output):
+    """ Returns the error message from a failed git pull/fetch/merge output """
+    error_match = re.search(r'(?:fatal|ERROR): (.+)', output)
+    if error_match:
+        error = error_match.group(1)
+    else:
+        # Progress lines are overwritten in place with carriage returns, so only the last one of each line is kept.
+        lines = (line.rsplit('\r', 1)[-1] for line in output.split('\n'))
+        error = '\n'.join(line for line in lines if line.strip() and not PROGRESS_LINE_RE.match(line))
+    return error.strip(' .\n')
 
 
 def update_tags(remote, path=None):
+    invalidate_repo_state(path)
     silent_run('git fetch --tags {}'.format(remote), cwd=path)
 
 
@@ -395,18 +1182,27 @@ def push_repo(path=None, force=False, remote=None, branch=None):
     if branch:
         push_opts.append(branch)
 
+    invalidate_repo_state(path)
     silent_run('git push ' + ' '.join(push_opts), cwd=path)
 
 
 def stat_repo(path=None, return_output=False, with_color=False):
+    return run(_stat_cmd(with_color), cwd=path, return_output=return_output)
+
+
+def _stat_cmd(with_color=False):
     if with_color:
-        cmd = 'git -c color.status=always status'
+        return 'git -c color.status=always status'
     else:
-        cmd = 'git status'
-    return run(cmd, cwd=path, return_output=return_output)
+        return 'git status'
 
 
 def diff_repo(path=None, branch=None, context=None, return_output=False, name_only=False, color=False):
+    cmd = _diff_cmd(branch=branch, context=context, name_only=name_only, color=color)
+    return run(cmd, cwd=path, return_output=return_output)
+
+
+def _diff_cmd(branch=None, context=None, name_only=False, color=False):
     cmd = ['git', 'diff']
     if name_only:
         cmd.append('--name-only')
@@ -416,12 +1212,12 @@ def diff_repo(path=None, branch=None, context=None, return_output=False, name_on
         cmd.append(branch)
     if context:
         cmd.append(context)
-
-    return run(cmd, cwd=path, return_output=return_output)
+    return cmd
 
 
 def commit_changes(msg):
     """ Commits any modified or new files with given message. Raises on error """
+    invalidate_repo_state()
     silent_run(['git', 'commit', '-am', msg])
     click.echo('Committed change.')
 
@@ -434,11 +1230,20 @@ def local_commit(msg=None, amend=False, empty=False):
         cmd.append('--allow-empty')
     if msg:
         cmd.extend(['-m', msg])
+    invalidate_repo_state()
     run(cmd)
 
 
-def checkout_product(product_url, checkout_path):
-    """ Checks out the product from url. Raises on error """
+def checkout_product(product_url, checkout_path, depth=None, filter=None, quiet=False):
+    """
+    Checks out the product from url, or updates it if it is already checked out. Raises on error
+
+    :param str product_url: Product URL, "user/repo" reference, or repo name to search for
+    :param str checkout_path: Path to checkout to
+    :param int depth: Create a shallow clone with history truncated to the number of commits for all branches.
+    :param str filter: Create a partial clone with the object filter, such as "blob:none" to fetch blobs on demand.
+    :param bool quiet: Don't show update progress
+    """
     product_url = product_url.strip('/')
 
     prod_name = product_name(product_url)
@@ -446,24 +1251,11 @@ def checkout_product(product_url, checkout_path):
     if os.path.exists(checkout_path):
         log.debug('%s is already checked out.', prod_name)
         checkout_branch('master', checkout_path)
-        return update_repo(checkout_path)
+        return update_repo(checkout_path, quiet=quiet)
 
-    if re.match('[\w-]+$', product_url):
-        try:
-            logging.getLogger('requests').setLevel(logging.WARN)
-            response = requests.get(config.checkout.search_api_url, params={'q': product_url}, timeout=10)
-            response.raise_for_status()
-            results = response.json()['items']
-            if not results:
-                log.error('No repo matching "%s" found.', product_url)
-                sys.exit(1)
-            product_url = results[0]['ssh_url']
-            click.echo('Using repo url ' + product_url)
-
-        except Exception as e:
-            log.error('Could not find repo for %s using %s due to error: ', product_url,
-                      config.checkout.search_api_url, e)
-            sys.exit(1)
+    if PRODUCT_NAME_RE.match(product_url):
+        product_url = product_url_resolver().resolve(product_url)
+        click.echo('Using repo url ' + product_url)
 
     elif USER_REPO_REFERENCE_RE.match(product_url):
         product_url = config.checkout.user_repo_url % product_url
@@ -471,19 +1263,175 @@ def checkout_product(product_url, checkout_path):
     is_origin = not config.checkout.origin_user or config.checkout.origin_user + '/' in product_url
     remote_name = DEFAULT_REMOTE if is_origin else UPSTREAM_REMOTE
 
-    silent_run(['git', 'clone', product_url, checkout_path, '--origin', remote_name])
+    clone_cmd = ['git', 'clone', product_url, checkout_path, '--origin', remote_name, '--progress']
+    if depth:
+        clone_cmd.extend(['--depth', str(depth), '--no-single-branch'])
+    if filter:
+        clone_cmd.append('--filter=' + filter)
+
+    # Shallow / partial clones are meant to download less, so they should not populate the cache with full mirrors.
+    reference_path = not (depth or filter) and reference_repo(product_url)
+    if reference_path:
+        clone_cmd.extend(['--reference', reference_path, '--dissociate'])
+
+    invalidate_repo_state(checkout_path)
+    output, success = silent_run(clone_cmd, return_output=2)
+    _record_bytes_fetched(output)
+    if reference_path:  # Not while cloning as the clone reads from it
+        refresh_reference_repo(reference_path)
+    if not success:
+        raise SCMError('Failed to clone {}: {}'.format(product_url, _pull_error(output)))
+    invalidate_parent_paths(checkout_path)
+
+    if not reference_path and not (depth or filter):
+        add_reference_repo(product_url, checkout_path)
 
     if not is_origin:
         origin_url = re.sub(r'(\.com[:/])(\w+)(/)', r'\1{}\3'.format(config.checkout.origin_user), product_url)
         silent_run(['git', 'remote', 'add', DEFAULT_REMOTE, origin_url], cwd=checkout_path)
 
 
+def reference_repo(product_url):
+    """
+    Returns the path to the bare mirror of the product in the reference cache to clone with, if there is one.
+    It should be refreshed with :func:`refresh_reference_repo` after the clone, so the next clone only fetches what has
+    changed since.
+
+    :param str product_url: URL of the product
+    :return: Path to the mirror, or None if the reference cache is turned off or there is no mirror yet.
+    """
+    mirror_path = _reference_repo_path(product_url)
+    if not mirror_path or not os.path.exists(mirror_path):
+        return None
+
+    os.utime(mirror_path, None)  # Used to find least recently used mirrors to remove
+
+    return mirror_path
+
+
+def refresh_reference_repo(mirror_path):
+    """
+    Fetches branches and tags for the mirror from the product URL in the background.
+
+    :param str mirror_path: Path to the mirror from :func:`reference_repo`
+    :return: The fetch process
+    """
+    # Detached from our process group so that it continues after wst exits and is not killed by CTRL+C
+    return subprocess.Popen(['git', 'fetch', '--prune', '--quiet', DEFAULT_REMOTE] + REFERENCE_REFSPECS,
+                            cwd=mirror_path, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def add_reference_repo(product_url, checkout_path):
+    """
+    Adds a bare mirror of the product to the reference cache from a fresh clone of it, so it is created without
+    downloading the repo again. Objects are hardlinked from the clone, and later refreshes only fetch branches and
+    tags from the product URL.
+
+    :param str product_url: URL of the product
+    :param str checkout_path: Path to the clone of the product
+    :return: Path to the mirror, or None if the reference cache is turned off or the mirror could not be created.
+    """
+    mirror_path = _reference_repo_path(product_url)
+    if not mirror_path:
+        return None
+
+    if os.path.exists(mirror_path):
+        return mirror_path
+
+    cache_dir = os.path.dirname(mirror_path)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Created in a temp path so that a partial mirror is never used, such as from CTRL+C or concurrent checkouts.
+    temp_path = '{}.{}.{}.tmp'.format(mirror_path, os.getpid(), threading.get_ident())
+
+    try:
+        silent_run(['git', 'clone', '--bare', '--quiet', checkout_path, temp_path])
+        silent_run(['git', 'remote', 'set-url', DEFAULT_REMOTE, product_url], cwd=temp_path)
+        for refspec in REFERENCE_REFSPECS:  # Bare clones do not have any, so refreshes would not update branches.
+            silent_run(['git', 'config', '--add', 'remote.{}.fetch'.format(DEFAULT_REMOTE), refspec], cwd=temp_path)
+
+    except Exception as e:
+        log.debug('Could not add reference mirror for %s: %s', product_url, e)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        return None
+
+    try:
+        os.rename(temp_path, mirror_path)
+    except OSError:  # Created by another checkout
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+    return mirror_path
+
+
+def _reference_repo_path(product_url):
+    """ Path to the mirror of the product in the reference cache, or None if it is turned off """
+    if not config.checkout.reference_cache_dir:
+        return None
+
+    cache_dir = os.path.expanduser(config.checkout.reference_cache_dir)
+    url_hash = hashlib.sha1(product_url.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(cache_dir, '{}-{}.git'.format(product_name(product_url), url_hash))
+
+
+def evict_reference_repos(used_since=None):
+    """
+    Removes least recently used mirrors from the reference cache until it is within the max cache size.
+
+    It should be called once after all checkouts are done, as mirrors that are being cloned from could be removed.
+
+    :param float used_since: Epoch time to keep mirrors used or added since regardless, such as when the checkouts
+                             started.
+    :return: List of removed mirror paths
+    """
+    cache_dir = os.path.expanduser(config.checkout.reference_cache_dir)
+    if not os.path.isdir(cache_dir):
+        return []
+
+    max_size = float(config.checkout.reference_cache_size_mb or 0) * 1024 * 1024
+    mirrors = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.git')]
+    sizes = dict((mirror, _dir_size(mirror)) for mirror in mirrors)
+    mtimes = dict((mirror, os.stat(mirror).st_mtime) for mirror in mirrors)
+    cache_size = sum(sizes.values())
+    removed = []
+
+    for mirror in sorted(mirrors, key=mtimes.get):
+        if cache_size <= max_size:
+            break
+
+        # Allows for filesystems with 1 second mtime resolution
+        if used_since is None or mtimes[mirror] < int(used_since):
+            log.debug('Removing %s from reference cache as it exceeds %s MB', mirror,
+                      config.checkout.reference_cache_size_mb)
+            shutil.rmtree(mirror, ignore_errors=True)
+            cache_size -= sizes[mirror]
+            removed.append(mirror)
+
+    return removed
+
+
+def _dir_size(path):
+    """ Total size of files in the given directory in bytes """
+    size = 0
+
+    for dir, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(dir, file)).st_size
+            except OSError:  # Removed during walk
+                pass
+
+    return size
+
+
 def checkout_files(files, repo_path=None):
     """ Checks out the given list of files. Raises on error. """
     silent_run(['git', 'checkout'] + files, cwd=repo_path)
 
 
 def hard_reset(to_commit):
+    invalidate_repo_state()
     run(['git', 'reset', '--hard', to_commit])
 
 
@@ -512,3 +1460,95 @@ def product_path(name, workspace_dir=None):
         workspace_dir = workspace_path()
 
     return os.path.join(workspace_dir, name)
+
+
+# Coroutine variants of the read-only queries used by status, diff, and clean, which run them for all repos from one
+# event loop. There is no coroutine variant of update_repo: updates are network bound and need per host limits,
+# retries with backoff, and progress reporting, which parallel_call already provides on threads.
+
+#: Max number of git processes to run concurrently from coroutines in the same event loop
+MAX_CONCURRENT_GIT = 20
+
+_git_semaphores = WeakKeyDictionary()
+
+
+async def async_run_git(cmd, cwd=None):
+    """
+    Coroutine version of :func:`utils.process.silent_run` with return_output=2 for git commands.
+
+    At most :data:`MAX_CONCURRENT_GIT` commands are run at the same time per event loop.
+
+    :param list/str cmd: Command with args to run.
+    :param str cwd: Change directory to cwd before running
+    :return: Tuple of (output, success) where output includes stderr
+    """
+    import asyncio  # Imported as needed as it is slow to import, which adds to the startup time of all commands.
+
+    if isinstance(cmd, str):
+        cmd = cmd.split()
+
+    _invalidate_if_mutating(cmd, cwd)
+
+    loop = asyncio.get_event_loop()
+    semaphore = _git_semaphores.get(loop)
+    if not semaphore:
+        semaphore = _git_semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_GIT)
+
+    async with semaphore:
+        log.debug('Running: %s %s', ' '.join(cmd), '[%s]' % cwd if cwd else '')
+        start = time.time()
+
+        try:
+            process = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT)
+        except Exception as e:
+            return 'Command "%s" could not be run because %s' % (' '.join(cmd), e), False
+
+        output, _ = await process.communicate()
+        record_subprocess(cmd, cwd, start, time.time(), process.returncode)
+
+    return output.decode('utf-8'), process.returncode == 0
+
+
+async def async_repo_state(repo=None):
+    """ Coroutine version of :func:`repo_state` that shares the same cache """
+    import asyncio
+
+    key = _repo_state_key(repo)
+    state = _repo_states.get(key)
+
+    if not state:
+        outputs = await asyncio.gather(async_run_git(RepoState.REMOTES_CMD, cwd=key),
+                                       async_run_git(RepoState.REFS_CMD, cwd=key))
+        state = _repo_states[key] = RepoState(key, outputs=outputs)
+
+    return state
+
+
+async def async_all_branches(repo=None, remotes=False, verbose=False):
+    """ Coroutine version of :func:`all_branches` """
+    await async_repo_state(repo)
+    return all_branches(repo=repo, remotes=remotes, verbose=verbose)
+
+
+async def async_current_branch(repo=None):
+    """ Coroutine version of :func:`current_branch` """
+    await async_repo_state(repo)
+    return current_branch(repo=repo)
+
+
+async def async_stat_repo(path=None, with_color=False):
+    """ Coroutine version of :func:`stat_repo` that returns the output. Raises :class:`SCMError` on error. """
+    output, success = await async_run_git(_stat_cmd(with_color), cwd=path)
+    if not success:
+        raise SCMError(output.strip())
+    return output
+
+
+async def async_diff_repo(path=None, branch=None, context=None, name_only=False, color=False):
+    """ Coroutine version of :func:`diff_repo` that returns the output. Raises :class:`SCMError` on error. """
+    cmd = _diff_cmd(branch=branch, context=context, name_only=name_only, color=color)
+    output, success = await async_run_git(cmd, cwd=path)
+    if not success:
+        raise SCMError(output.strip())
+    return output
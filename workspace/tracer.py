@@ -0,0 +1,179 @@
+"""
+Records subprocesses (git, tox, etc) that are run by a command with their durations and exit codes, along with the time
+spent in Python between them, to find out why a command is slow. Enabled with the global --profile / --trace options.
+
+The trace file uses the Chrome trace event format, which can be viewed in chrome://tracing, https://ui.perfetto.dev, or
+https://www.speedscope.app
+"""
+from __future__ import absolute_import
+import json
+import os
+import subprocess
+import threading
+import time
+
+import click
+
+#: Number of slowest calls to show in the summary
+TOP_CALLS = 10
+
+#: The :class:`Tracer` that is recording, if any
+active_tracer = None
+
+
+class Tracer(object):
+    """
+    Records subprocesses started while it is active by replacing :class:`subprocess.Popen`, which is used by
+    :func:`utils.process.run` / `silent_run` and others.
+    """
+
+    def __init__(self, title='wst'):
+        """
+        :param str title: Title of what is being traced, such as the command line.
+        """
+        self.title = title
+
+        #: List of dicts with cmd, cwd, start, end, exit_code, and thread for each subprocess
+        self.calls = []
+
+        self.start_time = None
+        self.end_time = None
+
+        self._original_popen = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ Start recording subprocesses """
+        global active_tracer
+
+        self.start_time = time.time()
+        self._original_popen = subprocess.Popen
+        subprocess.Popen = _traced_popen(self, self._original_popen)
+        active_tracer = self
+
+        return self
+
+    def stop(self):
+        """ Stop recording subprocesses """
+        global active_tracer
+
+        if self._original_popen:
+            subprocess.Popen = self._original_popen
+            self._original_popen = None
+        self.end_time = time.time()
+        active_tracer = None
+
+    def record(self, cmd, cwd, start, end, exit_code):
+        """ Record a subprocess that ran from start to end time """
+        if not isinstance(cmd, str):
+            cmd = ' '.join(str(arg) for arg in cmd)
+
+        with self._lock:
+            self.calls.append({'cmd': cmd, 'cwd': cwd or os.getcwd(), 'start': start, 'end': end,
+                               'exit_code': exit_code, 'thread': threading.current_thread().name})
+
+    def python_spans(self):
+        """ List of (start, end) times when no subprocess was running, i.e. time spent in Python """
+        spans = []
+        last_end = self.start_time
+
+        for call in sorted(self.calls, key=lambda c: c['start']):
+            if call['start'] > last_end:
+                spans.append((last_end, call['start']))
+            last_end = max(last_end, call['end'])
+
+        if self.end_time > last_end:
+            spans.append((last_end, self.end_time))
+
+        return spans
+
+    def summary(self, top=TOP_CALLS):
+        """ Summary of where the time went and the slowest calls """
+        total = self.end_time - self.start_time
+        python_time = sum(end - start for start, end in self.python_spans())
+        lines = ['Profile of "{}": {:.2f}s total, {:.2f}s waiting on {} subprocesses, {:.2f}s in Python'.format(
+            self.title, total, total - python_time, len(self.calls), python_time)]
+
+        if self.calls:
+            lines.append('Slowest calls:')
+            for call in sorted(self.calls, key=lambda c: c['end'] - c['start'], reverse=True)[:top]:
+                lines.append('  {:7.2f}s  {} [{}] (exit {})'.format(call['end'] - call['start'], call['cmd'],
+                                                                    call['cwd'], call['exit_code']))
+
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """ Events in Chrome trace event format """
+        def us(seconds):
+            return int((seconds - self.start_time) * 1000000)
+
+        threads = {'python': 0}
+        events = [{'name': self.title, 'ph': 'X', 'ts': 0, 'dur': us(self.end_time), 'pid': 1, 'tid': 0}]
+
+        for start, end in self.python_spans():
+            events.append({'name': 'python', 'cat': 'python', 'ph': 'X', 'ts': us(start), 'dur': us(end) - us(start),
+                           'pid': 1, 'tid': 0})
+
+        for call in self.calls:
+            tid = threads.setdefault(call['thread'], len(threads))
+            events.append({'name': ' '.join(call['cmd'].split()[:3]), 'cat': 'subprocess', 'ph': 'X',
+                           'ts': us(call['start']), 'dur': us(call['end']) - us(call['start']), 'pid': 1, 'tid': tid,
+                           'args': {'cmd': call['cmd'], 'cwd': call['cwd'], 'exit_code': call['exit_code']}})
+
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                           'args': {'name': 'Python' if tid == 0 else name}})
+
+        return events
+
+    def write_trace(self, path):
+        """ Write the trace events to the file """
+        with open(path, 'w') as fp:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, fp)
+
+    def report(self, trace_file=None):
+        """ Show the summary on stderr, and write the trace file if given """
+        click.echo(self.summary(), err=True)
+
+        if trace_file:
+            self.write_trace(trace_file)
+            click.echo('Trace written to {}'.format(trace_file), err=True)
+
+
+def record_subprocess(cmd, cwd, start, end, exit_code):
+    """
+    Record a subprocess with the active tracer, if any. This is only needed for subprocesses that are not waited on
+    using :class:`subprocess.Popen`, such as from asyncio.
+    """
+    if active_tracer:
+        active_tracer.record(cmd, cwd, start, end, exit_code)
+
+
+def _traced_popen(tracer, popen_class):
+    """ Returns a Popen subclass that records the subprocess with the tracer when it exits """
+
+    class TracedPopen(popen_class):
+        def __init__(self, args, *popen_args, **kwargs):
+            self._trace_start = time.time()
+            self._trace_cmd = args
+            self._trace_cwd = kwargs.get('cwd')
+            super(TracedPopen, self).__init__(args, *popen_args, **kwargs)
+
+        def wait(self, *args, **kwargs):
+            running = self.returncode is None
+            returncode = super(TracedPopen, self).wait(*args, **kwargs)
+            if running:
+                self._trace_exit()
+            return returncode
+
+        def poll(self):
+            running = self.returncode is None
+            returncode = super(TracedPopen, self).poll()
+            if running and returncode is not None:
+                self._trace_exit()
+            return returncode
+
+        def _trace_exit(self):
+            tracer.record(self._trace_cmd, self._trace_cwd, self._trace_start, time.time(), self.returncode)
+
+    return TracedPopen
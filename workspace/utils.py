@@ -1,9 +1,12 @@
 from contextlib import contextmanager
+import json
 import logging
 import os
 import signal
 import sys
 import tempfile
+import threading
+import time
 from utils.process import run
 
 
@@ -36,6 +39,9 @@ def prompt_with_editor(instruction):
         return '\n'.join([l for l in open(fh.name).read().split('\n') if not l.startswith('#')]).strip()
 
 
+_parent_paths = {}
+
+
 def parent_path_with_dir(directory, path=None):
     """
     Find parent that contains the given directory.
@@ -45,7 +51,8 @@ def parent_path_with_dir(directory, path=None):
     :return: Parent path that contains the directory
     :rtype: str on success or False on failure
     """
-    return parent_path_with(lambda p: os.path.isdir(os.path.join(p, directory)), path=path)
+    return parent_path_with(lambda p: os.path.isdir(os.path.join(p, directory)), path=path,
+                            cache_key=('dir', directory))
 
 
 def parent_path_with_file(name, path=None):
@@ -57,28 +64,64 @@ def parent_path_with_file(name, path=None):
     :return: Parent path that contains the file name
     :rtype: str on success or False on failure
     """
-    return parent_path_with(lambda p: os.path.isfile(os.path.join(p, name)), path=path)
+    return parent_path_with(lambda p: os.path.isfile(os.path.join(p, name)), path=path,
+                            cache_key=('file', name))
 
 
-def parent_path_with(check, path=None):
+def parent_path_with(check, path=None, cache_key=None):
     """
     Find parent that satisfies check with content.
 
     :param str check: Callable that accepts current path returns True if path should be returned
     :param str path: Initial path to look from. Defaults to current working directory.
+    :param hashable cache_key: Cache the result for all paths that are checked with this key, which should identify
+                               what the check looks for. Use :func:`invalidate_parent_paths` when it is changed.
     :return: Parent path that contains the directory
     :rtype: str on success or False on failure
     """
-    if path == '/':
-        return False
+    path = os.path.abspath(path or os.getcwd())
+    checked_paths = []
+    result = False
+
+    while path != '/':
+        if cache_key and (path, cache_key) in _parent_paths:
+            result = _parent_paths[path, cache_key]
+            break
+
+        checked_paths.append(path)
+
+        if check(path):
+            result = path
+            break
+
+        path = os.path.dirname(path)
+
+    if cache_key:
+        for checked_path in checked_paths:
+            _parent_paths[checked_path, cache_key] = result
 
+    return result
+
+
+def invalidate_parent_paths(path=None):
+    """
+    Invalidate cached results from :func:`parent_path_with`, such as after creating or removing a repo.
+
+    :param str path: Only invalidate results for this path and its sub-paths, or results that are this path or its
+                     sub-paths. Defaults to all.
+    """
     if not path:
-        path = os.getcwd()
+        _parent_paths.clear()
+        return
 
-    if check(path):
-        return path
+    path = os.path.abspath(path)
+    prefix = path.rstrip('/') + '/'
 
-    return parent_path_with(check, os.path.dirname(path))
+    for key, result in list(_parent_paths.items()):
+        checked_path, _ = key
+        if (checked_path == path or checked_path.startswith(prefix) or
+                result and (result == path or result.startswith(prefix))):
+            _parent_paths.pop(key, None)
 
 
 @contextmanager
@@ -106,66 +149,452 @@ def log_exception(title=None, exit=False, call=None, stack=False):
             sys.exit(1)
 
 
-def parallel_call(call, args, callback=None, workers=10, show_progress=None, progress_title='Progress'):
+def _to_args(arg):
+    return arg if isinstance(arg, (list, tuple, set)) else [arg]
+
+
+def ordered_async_call(call, args, workers=None):
+    """
+    Run a coroutine function concurrently for each arg in one event loop, and yield the results in the same order as args.
+
+    Each result is yielded as soon as it and all results before it are available, so the caller can stream
+    output without waiting for the slowest call. Exceptions are raised when their result is reached.
+
+    :param callable call: Coroutine function to call
+    :param list(iterable|non-iterable) args: List of args to call. One call per args.
+    :param int workers: Max number of calls to run at the same time. Defaults to no limit.
+    :return: Generator of tuples of (arg, result)
+    """
+    import asyncio
+
+    args = list(args)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)  # Subprocesses need the loop to be set in the main thread before Python 3.8
+    semaphore = workers and asyncio.Semaphore(workers)
+
+    async def limited_call(arg):
+        if not semaphore:
+            return await call(*_to_args(arg))
+
+        async with semaphore:
+            return await call(*_to_args(arg))
+
+    tasks = [loop.create_task(limited_call(arg)) for arg in args]
+
+    try:
+        for arg, task in zip(args, tasks):
+            # Only runs the loop until this task is done, but all other tasks make progress in the meantime.
+            yield arg, loop.run_until_complete(task)
+
+    finally:
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def parallel_call(call, args, callback=None, workers=10, show_progress=None, progress_title='Progress', label=str,
+                  dependencies=None, failed=None):
     """
     Call a callable in parallel for each arg
 
+    Calls are made in threads as they are mostly waiting on subprocesses (git, tox, etc), so args and results do
+    not need to be pickable and there is no process fork overhead.
+
+    Start / finish events for each call are reported by :class:`ProgressReporter`, which shows the calls in progress
+    on TTY when show_progress is set, and writes the events to :data:`progress_file` when set.
+
     :param callable call: Callable to call
     :param list(iterable|non-iterable) args: List of args to call. One call per args.
-    :param callable callback: Callable to call for each result.
+    :param callable callback: Callable to call for each result. It is called from the calling thread.
     :param int workers: Number of workers to use.
     :param bool/str/callable: Show progress.
                               If callable, it should accept two lists: completed args and all args and return progress string.
-    :return dict: Map of args to their results on completion
+    :param str progress_title: Title for the progress display and events
+    :param callable label: Callable that accepts an arg and returns its label for the progress display and events
+    :param dict dependencies: Map of arg to list of args that it depends on, which it is only called after.
+                              Otherwise, args are called in the given order as workers become available.
+    :param callable failed: Callable that accepts a result and returns True if the call failed, so args that depend on
+                            it (directly or not) are skipped with a None result. Requires dependencies.
+    :return dict: Map of args to their results on completion. Result is the exception message if the call raised,
+                  or False if the call exited with non-zero code.
     """
-    from multiprocessing import Pool, TimeoutError
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(1))
+
+    args = list(args)
+    executor = ThreadPoolExecutor(max(1, workers))
+    progress = ProgressReporter(progress_title, len(args), live=bool(show_progress), label=label)
+    futures = {}
+
+    def tracked_call(arg):
+        info = _progress_info.info = {}
+        start = time.time()
+        success = False
+        progress.start(arg)
+
+        try:
+            result = call(*_to_args(arg))
+            success = result is not False
+            return result
+
+        finally:
+            _progress_info.info = None
+            progress.finish(arg, time.time() - start, success, info)
+
+    results = {}
+    waiting = list(args)
+    dependencies = dict((arg, [d for d in deps if d in args and d != arg]) for arg, deps in (dependencies or {}).items())
 
-    signal.signal(signal.SIGTERM, lambda *args: sys.exit(1))
-    pool = Pool(workers, lambda: signal.signal(signal.SIGINT, signal.SIG_IGN))
+    def submit_ready():
+        """ Submit waiting args with their dependencies done in order, and returns the submitted futures """
+        submitted = set()
 
-    def to_tuple(a):
-        return a if isinstance(a, (list, tuple, set)) else [a]
+        for arg in list(waiting):
+            deps = dependencies.get(arg, [])
+            if not all(d in results for d in deps):
+                continue
+
+            waiting.remove(arg)
+
+            if failed and any(results[d] is None or failed(results[d]) for d in deps):
+                log.debug('Skipping %s as a dependency failed', label(arg))
+                results[arg] = None
+                return submitted | submit_ready()  # Dependents of skipped args may be skipped as well
+
+            future = executor.submit(tracked_call, arg)
+            futures[future] = arg
+            submitted.add(future)
+
+        # Dependency cycle, so call the rest in order
+        if not submitted and waiting and not any(arg not in results for arg in futures.values()):
+            arg = waiting.pop(0)
+            future = executor.submit(tracked_call, arg)
+            futures[future] = arg
+            submitted.add(future)
+
+        return submitted
 
     try:
-        async_results = [(arg, pool.apply_async(call, to_tuple(arg), callback=callback)) for arg in args]
-
-        results = {}
-        while len(results) != len(async_results):
-            for arg, result in async_results:
-                if arg not in results:
-                    try:
-                        # This allows processes to be interrupted by CTRL+C
-                        results[arg] = result.get(1)
-                    except TimeoutError:
-                        pass
-                    except Exception as e:
-                        results[arg] = str(e)
+        pending = submit_ready()
+
+        while pending:
+            # Unlike joining threads, waiting on futures can be interrupted by CTRL+C
+            done, pending = wait(pending, timeout=progress.refresh_interval, return_when=FIRST_COMPLETED)
+
+            if done and callback:
+                progress.clear()  # So callback output is not mixed with the display
+
+            for future in done:
+                arg = futures[future]
+                try:
+                    results[arg] = future.result()
+                except SystemExit as e:
+                    results[arg] = not e.code
+                except Exception as e:
+                    results[arg] = str(e)
+                else:
+                    if callback:
+                        callback(results[arg])
+
+            pending |= submit_ready()
 
             if show_progress:
                 if callable(show_progress):
-                    progress = show_progress(list(results.keys()), args)
+                    status = show_progress(list(results.keys()), args)
                 else:
-                    progress = '%.2f%% completed' % (len(results) * 100.0 / len(async_results))
-                show_status('%s: %s' % (progress_title, progress))
+                    status = '%.2f%% completed' % (len(results) * 100.0 / len(futures))
+                progress.show('%s: %s' % (progress_title, status))
 
-        pool.close()
-        pool.join()
+        executor.shutdown()
+        progress.close()
 
         return results
 
     except KeyboardInterrupt:
+        for future in futures:
+            future.cancel()
+        progress.close()
         os.killpg(os.getpid(), signal.SIGTERM)  # Kills any child processes from subprocesses.
-        pool.terminate()
-        pool.join()
+        executor.shutdown(wait=False)
         sys.exit()
 
 
+#: File to write progress events from :func:`parallel_call` to as JSON lines, or "-" for stderr.
+#: Set by the --progress-file option or WST_PROGRESS_FILE env var.
+progress_file = os.environ.get('WST_PROGRESS_FILE')
+
+_progress_info = threading.local()
+
+
+def add_progress_info(**info):
+    """
+    Add info to the finish event of the :func:`parallel_call` item that is running in the current thread, such as
+    bytes_fetched=1024. Numbers are added to any existing value. It does nothing when not called from parallel_call.
+    """
+    current = getattr(_progress_info, 'info', None)
+
+    if current is not None:
+        for key, value in info.items():
+            if isinstance(value, (int, float)) and key in current:
+                value += current[key]
+            current[key] = value
+
+
+class ProgressReporter(object):
+    """
+    Reports progress of calls as start / finish events.
+
+    Events are written to :data:`progress_file` as JSON lines, such as::
+
+        {"event": "finish", "title": "Update", "item": "workspace-tools", "time": 1571356800.1, "duration": 1.5,
+         "success": true, "bytes_fetched": 2048}
+
+    When live is set and stdout is a TTY, calls in progress are shown with how long they have been running under a
+    status line, and are redrawn in place. While it is shown, output from calls (e.g. click.echo or logging) goes
+    through :class:`_LiveOutput`, which clears the display before writing so the output is shown above it.
+    """
+    #: Max number of calls in progress to show
+    MAX_LINES = 10
+
+    def __init__(self, title, total, live=False, label=str):
+        """
+        :param str title: Title for the events, such as the command name.
+        :param int total: Total number of calls
+        :param bool live: Show calls in progress on TTY
+        :param callable label: Callable that accepts an arg and returns its label
+        """
+        self.title = title
+        self.total = total
+        self.label = label
+        self.live = live and _is_tty()
+
+        #: Map of arg to its start time for calls in progress
+        self.running = {}
+
+        #: List of (arg, duration, success) for finished calls
+        self.finished = []
+
+        self._status = None
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._stream = None
+
+        #: Stdout that the display is written to, and the original streams that were replaced by :class:`_LiveOutput`
+        self._stdout = sys.stdout
+        self._replaced = []
+        self._output_lock = threading.RLock()
+
+        if progress_file:
+            self._stream = sys.stderr if progress_file == '-' else open(progress_file, 'a')
+
+        if self.live:
+            self._route_output()
+
+    @property
+    def refresh_interval(self):
+        """ Seconds between redraws to update how long calls have been running, or None if not live """
+        return 0.5 if self.live else None
+
+    def start(self, arg):
+        with self._lock:
+            self.running[arg] = time.time()
+        self._write_event('start', arg)
+
+    def finish(self, arg, duration, success, info=None):
+        with self._lock:
+            self.running.pop(arg, None)
+            self.finished.append((arg, duration, success))
+        self._write_event('finish', arg, duration=round(duration, 3), success=success, **(info or {}))
+
+    def show(self, status=None):
+        """ Redraw the status line and calls in progress. Call this from the same thread that created the reporter. """
+        if status:
+            self._status = status
+
+        if not self.live:
+            return
+
+        now = time.time()
+        with self._lock:
+            running = sorted(self.running.items(), key=lambda r: r[1])
+
+        lines = [self._status or '%s: %d/%d completed' % (self.title, len(self.finished), self.total)]
+        for arg, start in running[:self.MAX_LINES]:
+            lines.append('  %-40s %6.1fs' % (self.label(arg), now - start))
+        if len(running) > self.MAX_LINES:
+            lines.append('  ... and %d more' % (len(running) - self.MAX_LINES))
+
+        with self._output_lock:
+            self.clear()
+            self._stdout.write('\n'.join(lines) + '\n')
+            self._stdout.flush()
+            self._lines = len(lines)
+
+    def clear(self):
+        """ Clear the display """
+        with self._output_lock:
+            if self._lines:
+                self._stdout.write('\x1b[%dF\x1b[J' % self._lines)  # Move cursor up to the first line and clear to end
+                self._stdout.flush()
+                self._lines = 0
+
+    def write_above(self, stream, text):
+        """ Write the text to the stream above the display. It is redrawn on the next :meth:`show`. """
+        with self._output_lock:
+            self.clear()
+            stream.write(text)
+            stream.flush()
+
+    def close(self):
+        """ Clear the display and close the event stream. Slowest calls are logged in debug mode. """
+        self._restore_output()
+        self.clear()
+
+        if self.finished:
+            slowest = sorted(self.finished, key=lambda f: f[1], reverse=True)[:5]
+            log.debug('%s: Slowest are %s', self.title,
+                      ', '.join('%s (%.1fs)' % (self.label(arg), duration) for arg, duration, _ in slowest))
+
+        if self._stream and self._stream is not sys.stderr:
+            self._stream.close()
+        self._stream = None
+
+    def _route_output(self):
+        """ Replace stdout / stderr, and the streams of logging handlers using them, with :class:`_LiveOutput` """
+        for name in ('stdout', 'stderr'):
+            stream = getattr(sys, name)
+            if name == 'stdout' or _isatty(stream):  # Stderr only affects the display when it is the same terminal
+                live_output = _LiveOutput(self, stream)
+                setattr(sys, name, live_output)
+                self._replaced.append((sys, name, stream))
+
+                for handler in logging.root.handlers:
+                    if isinstance(handler, logging.StreamHandler) and handler.stream is stream:
+                        handler.stream = live_output
+                        self._replaced.append((handler, 'stream', stream))
+
+    def _restore_output(self):
+        for obj, attr, stream in reversed(self._replaced):
+            live_output = getattr(obj, attr)
+            if isinstance(live_output, _LiveOutput):
+                live_output.close()
+            setattr(obj, attr, stream)
+        self._replaced = []
+
+    def _write_event(self, event, arg, **data):
+        if not self._stream:
+            return
+
+        data.update(event=event, title=self.title, item=self.label(arg), time=round(time.time(), 3))
+
+        with self._lock:
+            self._stream.write(json.dumps(data, sort_keys=True) + '\n')
+            self._stream.flush()
+
+
+class _LiveOutput(object):
+    """ Stream that writes complete lines above the display of a :class:`ProgressReporter` """
+
+    def __init__(self, reporter, stream):
+        self._reporter = reporter
+        self._stream = stream
+        self._buffer = ''
+
+    def write(self, text):
+        with self._reporter._output_lock:
+            self._buffer += text
+            if '\n' in self._buffer:
+                lines, self._buffer = self._buffer.rsplit('\n', 1)
+                self._reporter.write_above(self._stream, lines + '\n')
+
+    def flush(self):
+        """ Partial lines are kept until they are complete, so the display is not drawn in the middle of them. """
+        self._stream.flush()
+
+    def close(self):
+        """ Write any partial line that is left """
+        with self._reporter._output_lock:
+            if self._buffer:
+                self._reporter.write_above(self._stream, self._buffer)
+                self._buffer = ''
+
+    def __getattr__(self, attr):
+        return getattr(self._stream, attr)
+
+
+def _isatty(stream):
+    try:
+        return stream.isatty()
+    except Exception:
+        return False
+
+
+def _is_tty():
+    return (sys.stdout.isatty() and 'TERM' in os.environ) or os.environ.get('PYCHARM_HOSTED')
+
+
+class AdaptiveLimit(object):
+    """
+    Concurrency limit that adapts to how reliably calls complete, similar to TCP congestion control.
+
+    The limit starts at half of the max, grows by one per limit's worth of successful calls, and halves on transient
+    errors, such as from throttling. Durations are not used as calls can be slow for reasons other than load, such as
+    large repos. Use it as a context manager around each call, and report how the call went using :meth:`succeeded` or
+    :meth:`failed`.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        """
+        :param int max_limit: Max number of concurrent calls
+        :param int min_limit: Min number of concurrent calls
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+
+        #: Current number of concurrent calls allowed. It is a float so it can grow gradually.
+        self.limit = float(max(min_limit, max_limit // 2))
+
+        #: Number of calls in progress
+        self.active = 0
+
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.active >= int(self.limit):
+                self._condition.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def succeeded(self):
+        """ Record a successful call """
+        with self._condition:
+            self.limit = self._bounded(self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def failed(self):
+        """ Record a failed call, such as from throttling or connection errors """
+        with self._condition:
+            self.limit = self._bounded(self.limit / 2)
+
+    def _bounded(self, limit):
+        return min(self.max_limit, max(self.min_limit, limit))
+
+
 def show_status(message):
     """
       :param str message: Status message to show. If not, then status bar will be cleared.
     """
-    enabled = (sys.stdout.isatty() and 'TERM' in os.environ) or os.environ.get('PYCHARM_HOSTED')
-    if not enabled:
+    if not _is_tty():
         return
 
     sys.stdout.write('%s\r' % message)